@@ -1,4 +1,16 @@
-import random
+import random, struct
+
+from api._tables import P1H, P2H, S, P1W, P2W, U, HAND, WON, CARD_BITS, TRICK_POINTS, SUIT_IDS, RANK_IDS, MARRIAGE_MASKS, LOCATIONS, LOCATION_CODES, cards, count, from_view, to_view, from_codes, move_card, move_cards, move_card_pair
+from api._tables import UNPACK_REAL, UNPACK_P1, UNPACK_P2, pack_codes
+from api._tables import ZOBRIST_LOCATION, ZOBRIST_STOCK, ZOBRIST_TRICK, ZOBRIST_TRUMP
+
+def _exchange(masks, codes, trump_jack_index, trump_card_index, owner):
+	"""
+	Swaps the trump jack and the trump card within one view of the deck
+
+	:return: The change to the Zobrist hash of that view
+	"""
+	return move_card(masks, codes, trump_jack_index, S) ^ move_card(masks, codes, trump_card_index, owner)
 
 class Deck:
 	"""
@@ -8,21 +20,36 @@ class Deck:
 	__RANKS = ["A", "10", "K", "Q", "J"]
 	__SUITS = ["C", "D", "H", "S"]
 
-	# A list of length 20 representing all cards and their states
-	# The state is represented by a letter as follows:
-	# "P1H" : in the hand of player 1, 
-	# "P2H" : in the hand of player 2
-	# "S" : on the stack
-	__card_state = None # type: list[str]
-
-	# A list of length 20 representing all KNOWN cards and
-	# their states from the perspective of each player
-	# "P1H" : in the hand of player 1, 
-	# "P2H" : in the hand of player 2
-	# "U" : unknown - this will happen during the first phase of the game since the players don' t know the location of all cards
-	# "S" : on the stack
-	__p1_perspective = None
-	__p2_perspective = None
+	# Binary layout used by to_bytes: the packed location codes of the three views, the stock
+	# padded to 10 cards, the trick, the previous trick and a byte of flags. Missing cards are 255.
+	__STRUCT = struct.Struct("20s10s4BB")
+
+	# The number of bytes produced by to_bytes
+	BYTES = __STRUCT.size
+
+	# A list of six 20-bit masks, one per location, representing all cards and their states.
+	# Bit i of a mask is set when card i is in that location. The list is indexed
+	# by the location codes from api._tables:
+	# P1H : in the hand of player 1,
+	# P2H : in the hand of player 2
+	# S : on the stack
+	# P1W, P2W : in the pile of cards won by player 1 or 2
+	# U : unknown (always empty for the real card state)
+	__card_masks = None # type: list[int]
+
+	# A bytearray of length 20 holding the location code of each card, so a card
+	# can be moved between masks without searching for its current location.
+	# The list of strings ("P1H", "S", ...) is still available through
+	# get_card_states and get_perspective, but it is built from these codes.
+	__card_codes = None # type: bytearray
+
+	# Masks and codes in the same format, representing all KNOWN cards and
+	# their states from the perspective of each player. Unknown cards are in the U mask,
+	# this will happen during the first phase of the game since the players don' t know the location of all cards
+	__p1_masks = None # type: list[int]
+	__p1_codes = None # type: bytearray
+	__p2_masks = None # type: list[int]
+	__p2_codes = None # type: bytearray
 
 	#We use the following index representations for cards:
 
@@ -53,8 +80,17 @@ class Deck:
 	# The suit of the trump_suit card for this given deck instance.
 	__trump_suit = None # type: String
 
+	# The index of the trump suit in __SUITS, used with the tables in api._tables.
+	__trump_suit_id = None # type: int
+
 	__signature = None
 
+	# Zobrist hashes of the real card state and of each player's perspective, including the
+	# trick and the trump suit. They are updated with every change to the deck. See api._tables.
+	__key = None # type: int
+	__p1_key = None # type: int
+	__p2_key = None # type: int
+
 	def __init__(self,
 				card_state,	# type: list[str]
 				stock,		# type: list[int]
@@ -64,42 +100,89 @@ class Deck:
 				):
 		"""
 		:param card_state: list of current card states
-		:param card_state: list of current card states
-		:param card_state: list of current card states
+		:param p1_perspective: list of card states as known by player 1
+		:param p2_perspective: list of card states as known by player 2
 
 		:param stock: list of indexes of cards in stock
 		:param trump_suit: {C,D,H,S}
 		"""
 
-		self.__card_state	= card_state
+		self.__card_masks, self.__card_codes = from_view(card_state)
 
-		self.__p1_perspective = p1_perspective
-		self.__p2_perspective = p2_perspective
+		# A missing perspective is one in which nothing is known
+		self.__p1_masks, self.__p1_codes = from_view(p1_perspective if p1_perspective is not None else ["U"]*20)
+		self.__p2_masks, self.__p2_codes = from_view(p2_perspective if p2_perspective is not None else ["U"]*20)
 
 		self.__stock		= stock
 
 		self.__trump_suit	=  trump_suit if trump_suit is not None else self.get_suit(self.__stock[0])
+		self.__trump_suit_id = self.__SUITS.index(self.__trump_suit)
 
+		self.__trick = [None, None]
+		self.__previous_trick = [None, None]
+
+		self.__compute_keys()
+
+	# Creates a deck directly from location masks and codes, skipping the conversion from strings.
+	# The given lists are used as they are, not copied.
+	@staticmethod
+	def __from_masks(card_masks, card_codes, stock, p1_masks, p1_codes, p2_masks, p2_codes, trump_suit, trump_suit_id):
+		deck = Deck.__new__(Deck)
+		deck.__card_masks = card_masks
+		deck.__card_codes = card_codes
+		deck.__p1_masks = p1_masks
+		deck.__p1_codes = p1_codes
+		deck.__p2_masks = p2_masks
+		deck.__p2_codes = p2_codes
+		deck.__stock = stock
+		deck.__trump_suit = trump_suit
+		deck.__trump_suit_id = trump_suit_id
+		deck.__trick = [None, None]
+		deck.__previous_trick = [None, None]
+		deck.__signature = None
+		return deck
+
+	# Computes the Zobrist hashes of this deck from scratch.
+	def __compute_keys(self):
+		common = ZOBRIST_TRUMP[self.__trump_suit_id]
+		for player, card in enumerate(self.__trick):
+			if card is not None:
+				common ^= ZOBRIST_TRICK[player][card]
+
+		self.__key = self.__p1_key = self.__p2_key = common
+		for index in range(20):
+			self.__key ^= ZOBRIST_LOCATION[self.__card_codes[index]][index]
+			self.__p1_key ^= ZOBRIST_LOCATION[self.__p1_codes[index]][index]
+			self.__p2_key ^= ZOBRIST_LOCATION[self.__p2_codes[index]][index]
+
+		for position, card in enumerate(self.__stock):
+			self.__key ^= ZOBRIST_STOCK[position][card]
+
+	# Returns the Zobrist hash of the real card state, or of the given player's perspective.
+	def get_key(self, player=None):
+		if player is None:
+			return self.__key
+		return self.__p1_key if player == 1 else self.__p2_key
 
 
 	# Computes the rank of a given card index, following the ordering given above.
 	@staticmethod
 	def get_rank(index):
-		return Deck.__RANKS[index % 5]
+		return Deck.__RANKS[RANK_IDS[index]]
 
 
 	# Computes the suit of a given card index, following the ordering given above.
 	@staticmethod
 	def get_suit(index):
-		return Deck.__SUITS[int(index/5)]
+		return Deck.__SUITS[SUIT_IDS[index]]
 
 	# Returns a list of all the cards' states
 	def get_card_states(self):
-		return list(self.__card_state)
+		return to_view(self.__card_codes)
 
 	# Returns the state of the card at the specified index
 	def get_card_state(self, index):
-		return self.__card_state[index]
+		return LOCATIONS[self.__card_codes[index]]
 
 	# Returns a list of all cards currently in the stock
 	def get_stock(self):
@@ -115,7 +198,7 @@ class Deck:
 
 	# Sets the card at the specified index to the specified state
 	def set_card(self, index, state):
-		self.__card_state[index] = state
+		self.__key ^= move_card(self.__card_masks, self.__card_codes, index, LOCATION_CODES[state])
 
 	# Returns a tuple containing the card indices of the cards currently part of the trick. The index of a card will be
 	# set to None if no card is put down on that side of the trick. TODO: strange wording
@@ -127,34 +210,71 @@ class Deck:
 
 	# Places card in the trick in the position of the specified player. Returns the resulting trick.
 	def set_trick(self, player, card):
+		change = 0
+		if self.__trick[player-1] is not None:
+			change ^= ZOBRIST_TRICK[player-1][self.__trick[player-1]]
+		if card is not None:
+			change ^= ZOBRIST_TRICK[player-1][card]
+		self.__key ^= change
+		self.__p1_key ^= change
+		self.__p2_key ^= change
+
 		self.__trick[player-1] = card
 		return self.__trick
 
 	# Returns whether the specified player is able to exchange the trump card for its trump jack.
 	def can_exchange(self, player):
 
-		# Depending on whether this state is signed or not, we look either through
-		# the perspective of the full card deck, or the perspective of a single player
-		perspective = self.get_perspective()
-
 		# If game is in phase 1 and player has trump jack
-		return (self.get_stock_size() > 0) and (perspective[self.get_trump_jack_index()] == "P" + str(player) + "H")
+		return (self.get_stock_size() > 0) and (self.get_player_hand_mask(player) & CARD_BITS[self.get_trump_jack_index()] != 0)
 
 	# Returns a list of the cards in the hand of the player that is specified.
 	def get_player_hand(self, player):
-		search_term = "P1H" if player == 1 else "P2H"
-		search_array = self.get_perspective()
-		return [i for i, x in enumerate(search_array) if x == search_term]
+		return cards(self.get_player_hand_mask(player))
+
+	# Returns the hand of the specified player as a card mask.
+	def get_player_hand_mask(self, player):
+		# Depending on whether this deck is signed or not, we look either through
+		# the perspective of the full card deck, or the perspective of a single player
+		return self.__visible_masks()[HAND[player]]
+
+	# Returns the cards of the opponent's hand that the specified player has seen, as a card mask.
+	# Like get_perspective, a signed deck only shows the perspective of the signing player.
+	def get_known_opponent_hand_mask(self, player):
+		if self.__signature is not None:
+			player = self.__signature
+		masks = self.__p1_masks if player == 1 else self.__p2_masks
+		return masks[HAND[3 - player]]
+
+	# Returns the location codes of all cards (see api._tables) as a read-only view, without copying.
+	# The view follows the deck as it changes. With a player, or for a signed deck, it shows that player's perspective.
+	def get_location_codes(self, player=None):
+		if self.__signature is not None:
+			player = self.__signature
+		codes = self.__card_codes if player is None else self.__p1_codes if player == 1 else self.__p2_codes
+		return memoryview(codes).toreadonly()
+
+	# Returns the location masks of the full card deck, or of the signing player's perspective.
+	def __visible_masks(self):
+		if self.__signature is None:
+			return self.__card_masks
+		return self.__p1_masks if self.__signature == 1 else self.__p2_masks
 
 	# Returns the suit of the trump card.
 	def get_trump_suit(self):
 		return self.__trump_suit
 
+	# Returns the suit id (0-3, in the order C, D, H, S) of the trump suit.
+	def get_trump_suit_id(self):
+		return self.__trump_suit_id
+
 	# Swaps places of the trump card with the trump Jack.
 	def exchange_trump(self, trump_jack_index):
 		trump_card_index = self.__stock[0]
-		self.__card_state[trump_card_index] = self.__p1_perspective[trump_card_index] = self.__p2_perspective[trump_card_index] = self.__card_state[trump_jack_index]
-		self.__card_state[trump_jack_index] = self.__p1_perspective[trump_jack_index] = self.__p2_perspective[trump_jack_index] = "S"
+		owner = self.__card_codes[trump_jack_index]
+		self.__key ^= _exchange(self.__card_masks, self.__card_codes, trump_jack_index, trump_card_index, owner) ^ ZOBRIST_STOCK[0][trump_card_index] ^ ZOBRIST_STOCK[0][trump_jack_index]
+		self.__p1_key ^= _exchange(self.__p1_masks, self.__p1_codes, trump_jack_index, trump_card_index, owner)
+		self.__p2_key ^= _exchange(self.__p2_masks, self.__p2_codes, trump_jack_index, trump_card_index, owner)
 		self.__stock[0] = trump_jack_index
 
 		# This is done to help the visual part differentiate between
@@ -164,7 +284,7 @@ class Deck:
 	# Returns the index of the Jack of the trump suit.
 	def get_trump_jack_index(self):
 		#The Aces of different suits are always 5 apart from another Ace
-		trump_ace_index = self.__SUITS.index(self.__trump_suit) * 5
+		trump_ace_index = self.__trump_suit_id * 5
 
 		#The Jack of a suit is always 4 cards removed from the Ace of the same suit
 		trump_jack_index = trump_ace_index + 4
@@ -180,37 +300,38 @@ class Deck:
 	# Returns a list of possible marriages for the specified player.
 	def get_possible_mariages(self, player):
 		possible_mariages = []
-		player_hand = self.get_player_hand(player)
-		#TODO: quite bulky, maybe change into a more elegant solution or at the very least comment
-		if 2 in player_hand and 3 in player_hand:
-			possible_mariages.append((2, 3))
-			possible_mariages.append((3, 2))
-		if 7 in player_hand and 8 in player_hand:
-			possible_mariages.append((7, 8))
-			possible_mariages.append((8, 7))
-		if 12 in player_hand and 13 in player_hand:
-			possible_mariages.append((12, 13))
-			possible_mariages.append((13, 12))
-		if 17 in player_hand and 18 in player_hand:
-			possible_mariages.append((17, 18))
-			possible_mariages.append((18, 17))
+		player_hand = self.get_player_hand_mask(player)
+
+		# A marriage is possible in every suit of which both the King and the Queen are in hand
+		for suit, marriage in enumerate(MARRIAGE_MASKS):
+			if player_hand & marriage == marriage:
+				king = 5 * suit + 2
+				possible_mariages.append((king, king + 1))
+				possible_mariages.append((king + 1, king))
 
 		return possible_mariages
 
 	# Takes the top card of the stock and places it in the specified player's hand.
 	def draw_card(self, player):
-		if self.get_stock_size() == 0:
+		if len(self.__stock) == 0:
 			raise RuntimeError('Stack is empty.')
 		card = self.__stock.pop()
+		self.__key ^= ZOBRIST_STOCK[len(self.__stock)][card] ^ move_card(self.__card_masks, self.__card_codes, card, HAND[player])
 		if player == 1:
-			self.__card_state[card] = self.__p1_perspective[card] = "P1H"
+			self.__p1_key ^= move_card(self.__p1_masks, self.__p1_codes, card, P1H)
 		else:
-			self.__card_state[card] = self.__p2_perspective[card] = "P2H"
+			self.__p2_key ^= move_card(self.__p2_masks, self.__p2_codes, card, P2H)
 
 	# Puts the cards in the trick in the specified winner's pile of won cards. After this operation the trick is emptied.
 	# Player perspectives are also updated
 	def put_trick_away(self, winner):
-		self.__card_state[self.__trick[0]] = self.__card_state[self.__trick[1]] = self.__p1_perspective[self.__trick[0]] = self.__p1_perspective[self.__trick[1]] = self.__p2_perspective[self.__trick[0]] = self.__p2_perspective[self.__trick[1]] = "P1W" if winner == 1 else "P2W"
+		first, second = self.__trick
+
+		# The cards leave the trick and move to the won pile in every view
+		change = ZOBRIST_TRICK[0][first] ^ ZOBRIST_TRICK[1][second]
+		self.__key ^= change ^ move_cards(self.__card_masks, self.__card_codes, first, second, WON[winner])
+		self.__p1_key ^= change ^ move_cards(self.__p1_masks, self.__p1_codes, first, second, WON[winner])
+		self.__p2_key ^= change ^ move_cards(self.__p2_masks, self.__p2_codes, first, second, WON[winner])
 
 		# Don't need to make a deep copy in this instance, tested.
 		self.__previous_trick = self.__trick;
@@ -226,19 +347,22 @@ class Deck:
 		"""
 
 		if player == 1:
-			self.__p1_perspective[index] = card_state
+			self.__p1_key ^= move_card(self.__p1_masks, self.__p1_codes, index, LOCATION_CODES[card_state])
 		else:
-			self.__p2_perspective[index] = card_state
+			self.__p2_key ^= move_card(self.__p2_masks, self.__p2_codes, index, LOCATION_CODES[card_state])
 
 	#Look into overloading this function as well
 	# Generates a new deck based on a seed. If no seed is given, a random seed in generated.
 	@staticmethod
-	def generate(id=None):
+	def generate(id=None, phase=1):
 
 		rng = random.Random(id)
 		shuffled_cards = list(range(20))
 		rng.shuffle(shuffled_cards)
 
+		if phase == 2:
+			return Deck.__deal_phase2(rng, shuffled_cards)
+
 		card_state = [0]*20
 		p1_perspective = ["U"]*20
 		p2_perspective = ["U"]*20
@@ -265,6 +389,45 @@ class Deck:
 
 		return Deck(card_state, stock, p1_perspective, p2_perspective)
 
+	# Deals a deck as it is at the start of phase 2, directly from the shuffled cards: the stock is
+	# empty, both players have five cards in hand and the other ten cards were won in five tricks.
+	@staticmethod
+	def __deal_phase2(rng, shuffled_cards):
+		card_codes = bytearray(20)
+		p1_codes = bytearray([U] * 20)
+		p2_codes = bytearray([U] * 20)
+
+		for i in range(5):
+			card_codes[shuffled_cards[i]] = p1_codes[shuffled_cards[i]] = P1H
+		for i in range(5, 10):
+			card_codes[shuffled_cards[i]] = p2_codes[shuffled_cards[i]] = P2H
+
+		# The cards of each trick go to the won pile of its winner, which both players have seen. The
+		# winners are drawn again until neither pile is worth 66 points, which would have ended the game.
+		# Since the ten cards are worth at most 92 points and a trick at most 22, that never takes long.
+		tricks = [(shuffled_cards[i], shuffled_cards[i + 1]) for i in range(10, 20, 2)]
+		while True:
+			winners = [rng.choice((P1W, P2W)) for trick in tricks]
+			p1_points = sum(TRICK_POINTS[first * 20 + second] for (first, second), won in zip(tricks, winners) if won == P1W)
+			p2_points = sum(TRICK_POINTS[first * 20 + second] for (first, second), won in zip(tricks, winners) if won == P2W)
+			if p1_points < 66 and p2_points < 66:
+				break
+
+		for trick, won in zip(tricks, winners):
+			for card in trick:
+				card_codes[card] = p1_codes[card] = p2_codes[card] = won
+
+		# The trump card was the last card drawn from the stock, face up, so it is
+		# in one of the hands and both players know where
+		trump_card = shuffled_cards[rng.randrange(10)]
+		p1_codes[trump_card] = p2_codes[trump_card] = card_codes[trump_card]
+
+		trump_suit_id = SUIT_IDS[trump_card]
+		deck = Deck.__from_masks(from_codes(card_codes), card_codes, [], from_codes(p1_codes), p1_codes, from_codes(p2_codes), p2_codes, Deck.__SUITS[trump_suit_id], trump_suit_id)
+		deck.__compute_keys()
+
+		return deck
+
 	def make_assumption(self, seed=None):
 		"""
 		Identifies all unknown cards from the perspective of
@@ -277,71 +440,355 @@ class Deck:
 		if seed is None:
 			seed = random.randint(0, 100000)
 
-		rng = random.Random(seed)
+		return next(self.iter_assumptions(1, random.Random(seed)))
 
-		perspective = self.get_perspective()
+	def iter_assumptions(self, n=None, rng=None):
+		"""
+		Makes n guesses for the states of the unknown cards, like make_assumption, drawing
+		all of them from one random number generator. The work that is the same for every
+		guess is done once, up front.
 
-		trump_index = perspective.index("S")
+		:param n: The number of decks to generate. If None, decks are generated until the caller stops.
+		:param rng: Optional random.Random instance. Defaults to the global generator of the random module.
+		:return: A generator of deck objects with the unknown cards replaced by a random guess.
+		"""
+		if rng is None:
+			rng = random
 
-		unknowns = [index for index, card in enumerate(perspective) if card == "U"]
+		visible = self.__visible_masks()
+		base_codes = bytes(self.__card_codes if self.__signature is None else self.__p1_codes if self.__signature == 1 else self.__p2_codes)
 
-		rng.shuffle(unknowns)
+		trump_index = cards(visible[S])[0]
 
-		other_player_term = "P2H" if self.__signature == 1 else "P1H"
+		# The shuffle is done in place, so this buffer is reused for every guess
+		unknowns = cards(visible[U])
 
-		other_player_unknowns = 5 - perspective.count(other_player_term)
+		other_player_term = P2H if self.__signature == 1 else P1H
 
-		for i in range(other_player_unknowns):
-			perspective[unknowns.pop()] = other_player_term
+		other_player_unknowns = 5 - count(visible[other_player_term])
 
-		stock = [trump_index] + unknowns
+		# The last cards of the shuffled unknowns go to the other player, the rest is the stock
+		split = len(unknowns) - other_player_unknowns
 
-		for i in range(len(unknowns)):
-			perspective[unknowns.pop()] = "S"
+		# The masks and the hash of every guess without the unknown cards placed
+		base_masks = list(visible)
+		base_masks[U] = 0
 
-		deck = Deck(perspective, stock, list(self.__p1_perspective), list(self.__p2_perspective))
+		base_key = ZOBRIST_TRUMP[self.__trump_suit_id] ^ ZOBRIST_STOCK[0][trump_index]
+		for player, card in enumerate(self.__trick):
+			if card is not None:
+				base_key ^= ZOBRIST_TRICK[player][card]
+		for index in range(20):
+			if base_codes[index] != U:
+				base_key ^= ZOBRIST_LOCATION[base_codes[index]][index]
 
-		deck.__trick = list(self.__trick)
-		deck.__previous_trick = list(self.__previous_trick) if self.__previous_trick is not None else None
+		trick = self.__trick
+		previous_trick = self.__previous_trick
 
-		deck.__signature = None
+		generated = 0
+		while n is None or generated < n:
+			generated += 1
 
-		return deck
+			rng.shuffle(unknowns)
+
+			masks = list(base_masks)
+			codes = bytearray(base_codes)
+			key = base_key
+
+			for index in unknowns[split:]:
+				masks[other_player_term] |= CARD_BITS[index]
+				codes[index] = other_player_term
+				key ^= ZOBRIST_LOCATION[other_player_term][index]
+
+			stock = [trump_index] + unknowns[:split]
+
+			for position in range(1, len(stock)):
+				index = stock[position]
+				masks[S] |= CARD_BITS[index]
+				codes[index] = S
+				key ^= ZOBRIST_LOCATION[S][index] ^ ZOBRIST_STOCK[position][index]
+
+			deck = Deck.__from_masks(masks, codes, stock, list(self.__p1_masks), bytearray(self.__p1_codes), list(self.__p2_masks), bytearray(self.__p2_codes), self.__trump_suit, self.__trump_suit_id)
+
+			deck.__trick = list(trick)
+			deck.__previous_trick = list(previous_trick) if previous_trick is not None else None
+
+			deck.__key = key
+			deck.__p1_key = self.__p1_key
+			deck.__p2_key = self.__p2_key
+
+			yield deck
 
 	def clone(self, signature):
-		deck = Deck(list(self.__card_state), list(self.__stock), list(self.__p1_perspective), list(self.__p2_perspective), self.__trump_suit)
+		deck = Deck.__from_masks(list(self.__card_masks), bytearray(self.__card_codes), list(self.__stock), list(self.__p1_masks), bytearray(self.__p1_codes), list(self.__p2_masks), bytearray(self.__p2_codes), self.__trump_suit, self.__trump_suit_id)
 
 		deck.__signature = signature if self.__signature is None else self.__signature
 		deck.__trick = list(self.__trick)
 		deck.__previous_trick = list(self.__previous_trick) if self.__previous_trick is not None else None
 
+		deck.__key = self.__key
+		deck.__p1_key = self.__p1_key
+		deck.__p2_key = self.__p2_key
+
 		return deck
 
+	# Undo support for State.apply and State.undo. Instead of a copy of the deck, a move records with
+	# a save_ method the few locations it is about to change that do not follow from the rules, and
+	# the Zobrist hashes. The matching undo_ method moves the cards back and restores the hashes. The
+	# perspectives are changed regardless of the signature, as the moves do.
+
+	# Before the given player leads a card (and with a marriage shows the other card of it): how
+	# the opponent saw both cards.
+	def save_lead(self, player, card, partner):
+		codes = self.__p2_codes if player == 1 else self.__p1_codes
+		return codes[card], None if partner is None else codes[partner], self.__key, self.__p1_key, self.__p2_key
+
+	# Takes back a card led by the given player, recorded with save_lead.
+	def undo_lead(self, player, card, partner, saved):
+		seen, partner_seen, self.__key, self.__p1_key, self.__p2_key = saved
+		self.__trick[player - 1] = None
+
+		masks, codes = (self.__p2_masks, self.__p2_codes) if player == 1 else (self.__p1_masks, self.__p1_codes)
+		move_card(masks, codes, card, seen)
+		if partner is not None:
+			move_card(masks, codes, partner, partner_seen)
+
+	# Before the given player completes the trick with a card: how the leading player saw that card,
+	# the previous trick and, in phase 1, the two cards that will be drawn and how both players saw them.
+	def save_trick(self, player, card):
+		leader_codes = self.__p2_codes if player == 1 else self.__p1_codes
+		drawn = None
+		if len(self.__stock) > 0:
+			top = self.__stock[-1]
+			below = self.__stock[-2]
+			drawn = (top, below, self.__p1_codes[top], self.__p2_codes[top], self.__p1_codes[below], self.__p2_codes[below])
+
+		return leader_codes[card], self.__previous_trick, drawn, self.__key, self.__p1_key, self.__p2_key
+
+	# Takes back the card with which the given player completed a trick, recorded with save_trick:
+	# the cards drawn after the trick go back on the stock and the trick comes back from the won pile.
+	def undo_trick(self, player, saved):
+		seen, previous_trick, drawn, self.__key, self.__p1_key, self.__p2_key = saved
+
+		# The completed trick is the previous trick now
+		first, second = self.__previous_trick
+		first_bit = CARD_BITS[first]
+		second_bit = CARD_BITS[second]
+		won = self.__card_codes[first]
+
+		card_masks, card_codes = self.__card_masks, self.__card_codes
+		p1_masks, p1_codes = self.__p1_masks, self.__p1_codes
+		p2_masks, p2_codes = self.__p2_masks, self.__p2_codes
+
+		if drawn is not None:
+			# The winner of the trick drew the top card and the other player the card below it
+			top, below, p1_top, p2_top, p1_below, p2_below = drawn
+			top_bit = CARD_BITS[top]
+			below_bit = CARD_BITS[below]
+			if won == P1W:
+				card_masks[P1H] ^= top_bit
+				card_masks[P2H] ^= below_bit
+				p1_masks[P1H] ^= top_bit
+				p1_masks[p1_top] |= top_bit
+				p1_codes[top] = p1_top
+				p2_masks[P2H] ^= below_bit
+				p2_masks[p2_below] |= below_bit
+				p2_codes[below] = p2_below
+			else:
+				card_masks[P2H] ^= top_bit
+				card_masks[P1H] ^= below_bit
+				p2_masks[P2H] ^= top_bit
+				p2_masks[p2_top] |= top_bit
+				p2_codes[top] = p2_top
+				p1_masks[P1H] ^= below_bit
+				p1_masks[p1_below] |= below_bit
+				p1_codes[below] = p1_below
+			card_masks[S] |= top_bit | below_bit
+			card_codes[top] = card_codes[below] = S
+			self.__stock.append(below)
+			self.__stock.append(top)
+
+		# Both cards go back to the hands they were played from, in every view, except that the
+		# leading player may not have known the card it was answered with
+		trick_bits = first_bit | second_bit
+		card_masks[won] ^= trick_bits
+		card_masks[P1H] |= first_bit
+		card_masks[P2H] |= second_bit
+		card_codes[first] = P1H
+		card_codes[second] = P2H
+
+		p1_second = seen if player == 2 else P2H
+		p1_masks[won] ^= trick_bits
+		p1_masks[P1H] |= first_bit
+		p1_masks[p1_second] |= second_bit
+		p1_codes[first] = P1H
+		p1_codes[second] = p1_second
+
+		p2_first = seen if player == 1 else P1H
+		p2_masks[won] ^= trick_bits
+		p2_masks[p2_first] |= first_bit
+		p2_masks[P2H] |= second_bit
+		p2_codes[first] = p2_first
+		p2_codes[second] = P2H
+
+		# Only the card of the leading player stays in the trick
+		self.__trick = [None, second] if player == 1 else [first, None]
+		self.__previous_trick = previous_trick
+
+	# Before the trump jack is exchanged: the trump card, how both players saw the two cards and the previous trick.
+	def save_exchange(self, trump_jack_index):
+		trump_card_index = self.__stock[0]
+		return trump_card_index, self.__p1_codes[trump_jack_index], self.__p1_codes[trump_card_index], self.__p2_codes[trump_jack_index], self.__p2_codes[trump_card_index], self.__previous_trick, self.__key, self.__p1_key, self.__p2_key
+
+	# Takes back an exchange of the trump jack, recorded with save_exchange.
+	def undo_exchange(self, trump_jack_index, saved):
+		trump_card_index, p1_jack, p1_trump, p2_jack, p2_trump, self.__previous_trick, self.__key, self.__p1_key, self.__p2_key = saved
+
+		move_card_pair(self.__card_masks, self.__card_codes, trump_jack_index, self.__card_codes[trump_card_index], trump_card_index, S)
+		move_card_pair(self.__p1_masks, self.__p1_codes, trump_jack_index, p1_jack, trump_card_index, p1_trump)
+		move_card_pair(self.__p2_masks, self.__p2_codes, trump_jack_index, p2_jack, trump_card_index, p2_trump)
+		self.__stock[0] = trump_card_index
+
 	def get_perspective(self, player=None):
 		assert player == None or player == 1 or player == 2, "The value provided for player is invalid, this can only be 1, 2 or None"
 		if self.__signature is None:
 			if player is None:
-				return self.__card_state
-			return list(self.__p1_perspective) if player == 1 else list(self.__p2_perspective)
-		return list(self.__p1_perspective) if self.__signature == 1 else list(self.__p2_perspective)
+				return to_view(self.__card_codes)
+			return to_view(self.__p1_codes) if player == 1 else to_view(self.__p2_codes)
+		return to_view(self.__p1_codes) if self.__signature == 1 else to_view(self.__p2_codes)
 
 	def get_signature(self):
 		return self.__signature
 
 	def convert_to_json(self):
-		return {"card_state":self.__card_state, "p1_perspective":self.__p1_perspective, "p2_perspective":self.__p2_perspective, "trick":self.__trick, "previous_trick":self.__previous_trick, "stock":self.__stock, "trump_suit":self.__trump_suit, "signature":self.__signature}
+		return {"card_state":to_view(self.__card_codes), "p1_perspective":to_view(self.__p1_codes), "p2_perspective":to_view(self.__p2_codes), "trick":self.__trick, "previous_trick":self.__previous_trick, "stock":self.__stock, "trump_suit":self.__trump_suit, "signature":self.__signature}
 
 	@staticmethod
 	def load_from_json(dict):
-		deck = Deck(dict['card_state'], dict['stock'], dict['p1_perspective'], dict['p2_perspective'])
+		deck = Deck(dict['card_state'], dict['stock'], dict['p1_perspective'], dict['p2_perspective'], dict['trump_suit'])
 		deck.__signature = dict['signature']
 		deck.__trick = dict['trick']
 		deck.__previous_trick = dict['previous_trick']
+		deck.__compute_keys()
+
+		return deck
+
+	def canonical_suits(self, player=None):
+		"""
+		Non-trump suits are interchangeable: swapping two of them everywhere in the deck gives a
+		position with the same value. This finds a relabelling of the non-trump suits that is the
+		same for all decks which only differ by such a swap. The trump suit keeps its label.
+
+		:param player: Only use what this player knows (their perspective and the trump card, not
+			the stock order). A signed deck always uses the perspective of the signing player.
+		:return: A list mapping every suit id to its canonical suit id
+		"""
+		if self.__signature is not None:
+			player = self.__signature
+
+		if player is None:
+			views = (self.__card_codes, self.__p1_codes, self.__p2_codes)
+			stock = self.__stock
+		else:
+			views = (self.__p1_codes if player == 1 else self.__p2_codes,)
+			stock = self.__stock[:1]
+
+		# Everything that tells the cards of a suit apart: their locations, stock positions and trick slots
+		positions = [-1] * 20
+		for position, card in enumerate(stock):
+			positions[card] = position
+		for slot, card in enumerate(self.__trick):
+			if card is not None:
+				positions[card] = 10 + slot
+		if self.__previous_trick is not None:
+			for slot, card in enumerate(self.__previous_trick):
+				if card is not None:
+					positions[card] = 12 + slot
+
+		suits = [suit for suit in range(4) if suit != self.__trump_suit_id]
+		signatures = {suit: [(positions[card],) + tuple(codes[card] for codes in views) for card in range(5 * suit, 5 * suit + 5)] for suit in suits}
+
+		# The non-trump suit with the smallest signature gets the smallest non-trump label, etc.
+		permutation = list(range(4))
+		for label, suit in zip(suits, sorted(suits, key=signatures.__getitem__)):
+			permutation[suit] = label
+
+		return permutation
+
+	def permute_suits(self, permutation):
+		"""
+		:param permutation: A list mapping every suit id to a new suit id, e.g. from canonical_suits
+		:return: A copy of this deck in which every card is replaced by the card of the same rank in the new suit
+		"""
+		cards = [permutation[SUIT_IDS[card]] * 5 + RANK_IDS[card] for card in range(20)]
+
+		views = []
+		for codes in (self.__card_codes, self.__p1_codes, self.__p2_codes):
+			permuted = bytearray(20)
+			for card in range(20):
+				permuted[cards[card]] = codes[card]
+			views.append(permuted)
+
+		trump_suit_id = permutation[self.__trump_suit_id]
+		deck = Deck.__from_masks(from_codes(views[0]), views[0], [cards[card] for card in self.__stock], from_codes(views[1]), views[1], from_codes(views[2]), views[2], Deck.__SUITS[trump_suit_id], trump_suit_id)
+
+		deck.__signature = self.__signature
+		deck.__trick = [None if card is None else cards[card] for card in self.__trick]
+		if self.__previous_trick is not None:
+			deck.__previous_trick = [None if card is None else cards[card] for card in self.__previous_trick]
+		else:
+			deck.__previous_trick = None
+
+		deck.__compute_keys()
+
+		return deck
+
+	def to_bytes(self):
+		"""
+		:return: A compact binary encoding of this deck, of length Deck.BYTES.
+		"""
+		trick = [255 if card is None else card for card in self.__trick]
+		if self.__previous_trick is None:
+			previous_trick = [255, 255]
+		else:
+			previous_trick = [255 if card is None else card for card in self.__previous_trick]
+
+		# Flags: trump suit id in bits 0-1, signature in bits 2-3, no previous trick in bit 4
+		flags = self.__trump_suit_id | (self.__signature or 0) << 2 | (self.__previous_trick is None) << 4
+
+		stock = bytes(self.__stock) + b"\xff" * (10 - len(self.__stock))
+
+		return Deck.__STRUCT.pack(pack_codes(self.__card_codes, self.__p1_codes, self.__p2_codes), stock, trick[0], trick[1], previous_trick[0], previous_trick[1], flags)
+
+	@staticmethod
+	def from_bytes(data, offset=0):
+		"""
+		:param data: Bytes produced by to_bytes
+		:param offset: The position of the encoded deck within data
+		:return: The decoded deck
+		"""
+		packed, stock, trick_0, trick_1, previous_0, previous_1, flags = Deck.__STRUCT.unpack_from(data, offset)
+
+		card_codes = bytearray(packed.translate(UNPACK_REAL))
+		p1_codes = bytearray(packed.translate(UNPACK_P1))
+		p2_codes = bytearray(packed.translate(UNPACK_P2))
+
+		trump_suit_id = flags & 3
+		deck = Deck.__from_masks(from_codes(card_codes), card_codes, list(stock.rstrip(b"\xff")), from_codes(p1_codes), p1_codes, from_codes(p2_codes), p2_codes, Deck.__SUITS[trump_suit_id], trump_suit_id)
+
+		deck.__signature = (flags >> 2 & 3) or None
+		deck.__trick = [None if trick_0 == 255 else trick_0, None if trick_1 == 255 else trick_1]
+		if flags & 16:
+			deck.__previous_trick = None
+		else:
+			deck.__previous_trick = [None if previous_0 == 255 else previous_0, None if previous_1 == 255 else previous_1]
+
+		deck.__compute_keys()
 
 		return deck
 
 	def __eq__(self, o):
-		return self.__card_state == o.__card_state and self.__p1_perspective == o.__p1_perspective and self.__p2_perspective == o.__p2_perspective and self.__trick == o.__trick and self.__stock == o.__stock and self.__trump_suit == o.__trump_suit and self.__signature == o.__signature
+		return self.__card_masks == o.__card_masks and self.__p1_masks == o.__p1_masks and self.__p2_masks == o.__p2_masks and self.__trick == o.__trick and self.__stock == o.__stock and self.__trump_suit == o.__trump_suit and self.__signature == o.__signature
 
 	def __ne__(self, o):
-		return not (self.__card_state == o.__card_state and self.__p1_perspective == o.__p1_perspective and self.__p2_perspective == o.__p2_perspective and self.__trick == o.__trick and self.__stock == o.__stock and self.__trump_suit == o.__trump_suit and self.__signature == o.__signature)
+		return not (self.__card_masks == o.__card_masks and self.__p1_masks == o.__p1_masks and self.__p2_masks == o.__p2_masks and self.__trick == o.__trick and self.__stock == o.__stock and self.__trump_suit == o.__trump_suit and self.__signature == o.__signature)
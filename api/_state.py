@@ -1,7 +1,11 @@
 from api import util, Deck
+from api._tables import P1W, P2W, SUIT_IDS, CARD_POINTS, LEAD_WINS, TRICK_POINTS, CARD_BITS, SUIT_MASKS, HIGHER_MASKS, KINGS_MASK, MARRIAGE_CODE, EXCHANGE_CODE, cards
+from api._tables import ZOBRIST_POINTS, ZOBRIST_PENDING, ZOBRIST_PLAYER1S_TURN, ZOBRIST_LEADS_TURN, ZOBRIST_PHASE2, ZOBRIST_REVOKED
 from json import dumps
-import random
+import random, struct
 
+# The kinds of undo entries recorded by State.apply
+_REVOKE, _EXCHANGE, _LEAD, _FOLLOW = range(4)
 
 class State:
 	__deck = None  # type: Deck
@@ -22,6 +26,20 @@ class State:
 
 	__revoked = None  # type: int, None
 
+	# Binary layout used by to_bytes after the encoded deck: both players' points,
+	# both players' pending points and a byte of flags
+	__STRUCT = struct.Struct("4BB")
+
+	# The number of bytes produced by to_bytes
+	BYTES = Deck.BYTES + __STRUCT.size
+
+	# Undo entries for the moves applied in place with apply(), most recent last
+	__history = None  # type: list[tuple]
+
+	# Debug mode: when True, moves passed to next_trusted() or apply(move, trusted=True) are
+	# checked as well, and an error is raised if one of them is not legal.
+	check_trusted_moves = False
+
 	def __init__(self,
 				 deck,
 				 player1s_turn,
@@ -49,6 +67,8 @@ class State:
 		self.__p1_pending_points = p1_pending_points
 		self.__p2_pending_points = p2_pending_points
 
+		self.__history = []
+
 	def next(self,
 			 move  # type: tuple(int, int)
 			 ):
@@ -59,6 +79,99 @@ class State:
 		:param move: Tuple of length 2 of which each element can either be an int or None
 		:return: Newly computed state based on current state and given move
 		"""
+		self.__check_can_move(move)
+
+		# Start with a copy of the current state
+		state = self.clone()  # type: State
+
+		state.__apply_move(move)
+
+		return state
+
+	def next_trusted(self,
+			 move  # type: tuple(int, int)
+			 ):
+		"""
+		Computes the next state based on the given move, without checking whether the move is
+		legal. Only use this for moves taken from moves() of this state, e.g. in a search or a
+		rollout. Moves submitted by bots to the engine should go through next(), which revokes
+		the game on an illegal move. Set State.check_trusted_moves to check the moves anyway.
+
+		:param move: Tuple of length 2 of which each element can either be an int or None
+		:return: Newly computed state based on current state and given move
+		"""
+		self.__check_can_move(move)
+		self.__check_trusted(move)
+
+		# Start with a copy of the current state
+		state = self.clone()  # type: State
+
+		state.__apply_move(move, True)
+
+		return state
+
+	def apply(self,
+			  move,  # type: tuple(int, int)
+			  trusted=False
+			  ):
+		"""
+		Changes this state in place into the next state for the given move. Unlike next(), no
+		new State or Deck objects are created, which makes this the cheaper way for search
+		bots to walk the game tree. Every apply() must be reverted with a call to undo().
+
+		:param move: Tuple of length 2 of which each element can either be an int or None
+		:param trusted: Skip checking whether the move is legal, as next_trusted() does
+		"""
+		self.__check_can_move(move)
+		if trusted:
+			self.__check_trusted(move)
+		elif not self.__is_valid(move):
+			# As in next(), an illegal move only ends the game
+			self.__history.append((_REVOKE, move, None, self.__phase, self.__leads_turn, self.__player1s_turn, self.__p1_points, self.__p2_points, self.__p1_pending_points, self.__p2_pending_points))
+			self.__revoked = self.whose_turn()
+			return
+
+		# The undo entry holds the part of the deck the move changes (see Deck.save_lead and
+		# the like) and the scalar fields, which are cheaper to keep than to recompute
+		player = 1 if self.__player1s_turn else 2
+
+		if move[0] is None:
+			kind, saved = _EXCHANGE, self.__deck.save_exchange(move[1])
+		elif self.__leads_turn:
+			kind, saved = _LEAD, self.__deck.save_lead(player, move[0], move[1])
+		else:
+			kind, saved = _FOLLOW, self.__deck.save_trick(player, move[0])
+
+		self.__history.append((kind, move, saved, self.__phase, self.__leads_turn, self.__player1s_turn, self.__p1_points, self.__p2_points, self.__p1_pending_points, self.__p2_pending_points))
+
+		self.__apply_move(move, True)
+
+	def undo(self):
+		"""
+		Reverts the most recent move made with apply(), restoring the state exactly as it was before that move.
+		"""
+		if len(self.__history) == 0:
+			raise RuntimeError('There is no applied move to undo.')
+
+		kind, move, saved, self.__phase, self.__leads_turn, self.__player1s_turn, self.__p1_points, self.__p2_points, self.__p1_pending_points, self.__p2_pending_points = self.__history.pop()
+		self.__revoked = None
+
+		# With the turn restored, this is the player who made the move
+		player = 1 if self.__player1s_turn else 2
+
+		if kind == _FOLLOW:
+			self.__deck.undo_trick(player, saved)
+		elif kind == _LEAD:
+			self.__deck.undo_lead(player, move[0], move[1], saved)
+		elif kind == _EXCHANGE:
+			self.__deck.undo_exchange(move[1], saved)
+
+	def __check_can_move(self, move):
+		"""
+		Raises an error if no move can be made from this state
+
+		:param move: tuple representing move
+		"""
 		assert not move == None, "The move provided was None"
 		if self.__signature is not None and self.__signature != self.whose_turn():
 			raise RuntimeError('\n\nGame is in phase 1. Cannot view next state with imperfect information. Try making an assumption first.\n')
@@ -66,85 +179,95 @@ class State:
 		if self.finished():
 			raise RuntimeError('Gamestate is finished. No next states exist.')
 
-		# Start with a copy of the current state
-		state = self.clone()  # type: State
+	def __check_trusted(self, move):
+		"""
+		In debug mode, raises an error if a move that is passed as trusted is not legal
+
+		:param move: tuple representing move
+		"""
+		if State.check_trusted_moves and not self.__is_valid(move):
+			raise RuntimeError("The move {} was passed as trusted, but it is not legal in this state.".format(move))
 
+	def __apply_move(self, move, trusted=False):
+		"""
+		Changes this state into the next state for the given move. Shared by next() and apply().
+
+		:param move: Tuple of length 2 of which each element can either be an int or None
+		:param trusted: Whether the move is known to be legal, so the check can be skipped
+		"""
 		# If we find an invalid move, we set the __revoked class variable
-		# To the pid of the player who made the incorrect move, and return the state as is.
-		if not state.__is_valid(move):
-			state.__revoked = state.whose_turn()
-			return state
+		# To the pid of the player who made the incorrect move, and leave the state as is.
+		if not trusted and not self.__is_valid(move):
+			self.__revoked = self.whose_turn()
+			return
 
 		# If move is a trump exchange
 		if move[0] is None:
 
 			# Store the indices we need in variables
 			trump_jack_index = move[1]
-			trump_card_index = state.__deck.get_trump_card_index()
+			trump_card_index = self.__deck.get_trump_card_index()
 
 			# Perform trump jack exchange, perspective updated in function
-			state.__exchange_trump(trump_jack_index)
+			self.__exchange_trump(trump_jack_index)
 
-			return state
+			return
 
 		# Change turns
-		state.__leads_turn = not state.__leads_turn
+		self.__leads_turn = not self.__leads_turn
 
 		#Add the given move to the trick, store the whole trick in a variable
-		trick = state.__deck.set_trick(state.whose_turn(), move[0])
+		trick = self.__deck.set_trick(self.whose_turn(), move[0])
 
 		# At this point, we know that the move is not a trump jack exchange.
 		# Check if this move is a marriage
 		if move[1] is not None:
 
 			# A marriage cannot be melded by the non-leading player
-			if state.__leads_turn:
+			if self.__leads_turn:
 				raise RuntimeError("Marriage was attempted to be melded by non-leading player")
 
 			# Update perspective since an additional card is revealed by the player who performs a marriage.
-			state.__deck.add_to_perspective(util.other(state.whose_turn()), move[1], "P" + str(state.whose_turn()) + "H")
+			self.__deck.add_to_perspective(util.other(self.whose_turn()), move[1], "P" + str(self.whose_turn()) + "H")
 
 			# Trump suit marriage yields 40 points, regular yields 20, to be awarded at next trick win.
-			if Deck.get_suit(move[1]) == state.__deck.get_trump_suit():
-				state.__reserve_pending_points(state.whose_turn(), 40)
+			if SUIT_IDS[move[1]] == self.__deck.get_trump_suit_id():
+				self.__reserve_pending_points(self.whose_turn(), 40)
 			else:
-				state.__reserve_pending_points(state.whose_turn(), 20)
+				self.__reserve_pending_points(self.whose_turn(), 20)
 
 		# If it is not the lead's turn, i.e. currently the trick is
 		# incomplete and we already know it's not a trump jack exchange
-		if not state.__leads_turn:
-			other = state.whose_turn()
-			state.__player1s_turn = not state.__player1s_turn
-			state.__deck.add_to_perspective(state.whose_turn(), trick[other-1], "P" + str(other) + "H")
-			return state
+		if not self.__leads_turn:
+			other = self.whose_turn()
+			self.__player1s_turn = not self.__player1s_turn
+			self.__deck.add_to_perspective(self.whose_turn(), trick[other-1], "P" + str(other) + "H")
+			return
 
 		# At this point we know that it is the lead's turn and that a complete
 		# trick from the previous hand can be evaluated.
 
 		# Evaluate the trick and store the winner in the leader variable
-		leader = state.__evaluate_trick(trick)
+		leader = self.__evaluate_trick(trick)
 
-		state.__allocate_trick_points(leader, trick)
+		self.__allocate_trick_points(leader, trick)
 
-		state.__deck.put_trick_away(leader)
+		self.__deck.put_trick_away(leader)
 
-		if state.__phase == 2 and len(state.hand()) == 0 and not state.finished():
+		if self.__phase == 2 and self.hand_mask() == 0 and not self.finished():
 			# If all cards are exhausted, the winner of the last trick wins the game
-			state.__set_points(leader, 66)
+			self.__set_points(leader, 66)
 
 		#Draw cards from stock
-		if state.__phase == 1:
-			state.__deck.draw_card(leader)
-			state.__deck.draw_card(util.other(leader))
-			if state.__deck.get_stock_size() == 0:
-				state.__phase = 2
+		if self.__phase == 1:
+			self.__deck.draw_card(leader)
+			self.__deck.draw_card(util.other(leader))
+			if self.__deck.get_stock_size() == 0:
+				self.__phase = 2
 
 
 		# Set player1s_turn according to the leader variable
-		state.__player1s_turn = True if leader == 1 else False
-
-		# Returns state
-		return state
+		self.__player1s_turn = True if leader == 1 else False
 
 	def finished(self):
 		"""
@@ -195,8 +318,9 @@ class State:
 
 		return winner, points
 
-	def moves(self):
+	def moves(self, encoded=False):
 		"""
+		:param encoded: Whether to return the moves as integer codes (see util.encode_move) instead of tuples
 		:return: A list of all the legal moves that can be made by the player whose turn it is.
 			A move is a tuple of length 2. There are 3 distinct cases:
 				- (int, None): first element indicates the index of the card that is placed down.
@@ -205,57 +329,49 @@ class State:
 					second element is the index of that trump jack
 		"""
 
-		hand = self.hand()
+		hand = self.__deck.get_player_hand_mask(self.whose_turn())
 
-		if self.__signature is not None and len(hand) == 0:
+		if self.__signature is not None and hand == 0:
 			raise RuntimeError("\n\nGame is in phase 1. Insufficient information to derive any of the opponent's possible moves. Try to make an assumption\n")
 
-		possible_moves = []
-
 		# In this case, no constraints are put on the move
 		if self.__phase == 1 or self.whose_turn() == self.leader():
+			playable = hand
 
-			for card in hand:
-				possible_moves.append((card, None))
-
-		# If the game is in phase 2 and it's not the leader's turn, then some constraints apply
+		# If the game is in phase 2 and it's not the leader's turn, then some constraints apply:
+		# a higher card of the same suit must be played if there is one, otherwise a card of the
+		# same suit, otherwise a trump card, otherwise any card.
 		else:
 			opponent_card = self.get_opponents_played_card()
-			same_suit_hand = [card for card in hand if Deck.get_suit(card) == Deck.get_suit(opponent_card)]
-			playable_cards = None
-
-			if len(same_suit_hand) > 0:
-				same_suit_hand_higher = [card for card in same_suit_hand if card < opponent_card]
-
-				if len(same_suit_hand_higher) > 0:
-					playable_cards = same_suit_hand_higher
-
-				else:
-					playable_cards = same_suit_hand
-
-			elif Deck.get_suit(opponent_card) != self.__deck.get_trump_suit():
-				trump_hand = [card for card in hand if Deck.get_suit(card) == self.__deck.get_trump_suit()]
-				if len(trump_hand) > 0:
-
-					playable_cards = trump_hand
-
-				else:
-					playable_cards = hand
+			same_suit_hand = hand & SUIT_MASKS[SUIT_IDS[opponent_card]]
 
+			if same_suit_hand != 0:
+				playable = (same_suit_hand & HIGHER_MASKS[opponent_card]) or same_suit_hand
 			else:
-				playable_cards = hand
+				# If the trump suit was led, there can't be any trump cards in hand here
+				playable = (hand & SUIT_MASKS[self.__deck.get_trump_suit_id()]) or hand
 
-			possible_moves = [(card, None) for card in playable_cards]
+		if encoded:
+			possible_moves = cards(playable)
+		else:
+			possible_moves = [(card, None) for card in cards(playable)]
 
 		#Add possible trump jack exchanges and mariages to moves
 		#Marriages and exchanges can only be made by the leading player
 		if self.whose_turn() == self.leader():
 
-			if self.__deck.can_exchange(self.whose_turn()):
-				possible_moves.append((None, self.__deck.get_trump_jack_index()))
+			trump_jack = self.__deck.get_trump_jack_index()
+			if self.__deck.get_stock_size() > 0 and hand & CARD_BITS[trump_jack] != 0:
+				possible_moves.append(EXCHANGE_CODE + trump_jack if encoded else (None, trump_jack))
 
-			possible_mariages = self.__deck.get_possible_mariages(self.whose_turn())
-			possible_moves += possible_mariages
+			# The Kings which have their Queen in hand as well
+			kings = hand & (hand >> 1) & KINGS_MASK
+			if kings != 0:
+				for king in cards(kings):
+					if encoded:
+						possible_moves += [MARRIAGE_CODE + king, MARRIAGE_CODE + king + 1]
+					else:
+						possible_moves += [(king, king + 1), (king + 1, king)]
 
 		return possible_moves
 
@@ -266,17 +382,38 @@ class State:
 		"""
 		return self.__deck.get_player_hand(self.whose_turn())
 
+	def hand_mask(self):
+		"""
+		:return: The cards in the current player's hand as a card mask, in which bit i is set when card i is in hand
+		"""
+		return self.__deck.get_player_hand_mask(self.whose_turn())
+
+	def known_opponent_hand_mask(self):
+		"""
+		:return: The cards in the opponent's hand that the current player has seen (e.g. through a marriage
+			or a trump jack exchange) as a card mask
+		"""
+		return self.__deck.get_known_opponent_hand_mask(self.whose_turn())
+
 
 	def clone(self, signature=None):
 		"""
 		:return: Returns a deep copy of the current state
 		"""
-		state = State(self.__deck.clone(signature), self.__player1s_turn, self.__p1_points, self.__p2_points, self.__p1_pending_points, self.__p2_pending_points)
+		return self.__copy(self.__deck.clone(signature), signature if self.__signature is None else self.__signature)
+
+	def __copy(self, deck, signature):
+		"""
+		:param deck: The Deck object used by the copy
+		:param signature: The signature of the copy
+		:return: A copy of the current state with the given deck and signature
+		"""
+		state = State(deck, self.__player1s_turn, self.__p1_points, self.__p2_points, self.__p1_pending_points, self.__p2_pending_points)
 		state.__phase = self.__phase
 		state.__leads_turn = self.__leads_turn
 		state.__revoked = self.__revoked
 
-		state.__signature = signature if self.__signature is None else self.__signature
+		state.__signature = signature
 
 		return state
 
@@ -290,7 +427,7 @@ class State:
 		"""
 		assert startingPlayer == None or startingPlayer == 1 or startingPlayer == 2
 		rng = random.Random(id)
-		deck = Deck.generate(id)
+		deck = Deck.generate(id, phase)
 		if startingPlayer == None:
 			player1s_turn = rng.choice([True, False])
 		else:
@@ -299,21 +436,27 @@ class State:
 		state = State(deck, player1s_turn)
 
 		if phase == 2:
-			while state.__phase == 1:
-				if state.finished():
-					return State.generate(id if id is None else id+1, phase) # Father forgive me
-
-				state = state.next(rng.choice(state.moves()))
-
-			total_score = state.__p1_points + state.__p2_points
-			state.__set_points(1, int(total_score/2))
-			state.__p1_pending_points = 0
+			# The deck is dealt directly at the start of phase 2. Every player has the points
+			# of the cards in their won pile, which the deal keeps below 66.
+			codes = deck.get_location_codes()
+			state.__set_points(1, sum(CARD_POINTS[index] for index in range(20) if codes[index] == P1W))
+			state.__set_points(2, sum(CARD_POINTS[index] for index in range(20) if codes[index] == P2W))
 
-			state.__set_points(2, int(total_score/2))
-			state.__p2_pending_points = 0
+		return state
 
+	@staticmethod
+	def generate_many(ids, phase=1, startingPlayer=None):
+		"""
+		Generates a state for each of the given seeds, e.g. for a set of benchmark positions.
 
-		return state
+		:param ids: An iterable of seeds, see generate
+		:param phase: The phase at which the generated states start at
+		:param startingPlayer: the player (1 or 2) that must start every game. If None, it will be drawn randomly.
+		:return: A generator of the generated states, in the order of the seeds. Each state is only
+			generated when it is asked for, so the seeds can be an endless iterator.
+		"""
+		for id in ids:
+			yield State.generate(id, phase, startingPlayer)
 
 	def __repr__(self):
 		# type: () -> str
@@ -418,6 +561,61 @@ class State:
 		"""
 		return self.__phase
 
+	def key(self, player=None):
+		"""
+		A 64-bit Zobrist hash of this state, for use in transposition tables and caches. Equal
+		states have equal keys. The card part of the hash is kept up to date by the deck as cards
+		move, so this takes constant time.
+
+		In phase 1 the key can be limited to the information one player has (their perspective
+		instead of the real card locations), so that all states this player can not tell apart
+		share a key. This is done for the given player, or for the player whose signature this
+		state carries.
+
+		:param player: The player id of the player whose information should be hashed, or None
+		:return: An integer
+		"""
+		if player is None:
+			player = self.__signature
+
+		key = self.__deck.get_key(player if self.__phase == 1 else None)
+
+		if self.__player1s_turn:
+			key ^= ZOBRIST_PLAYER1S_TURN
+		if self.__leads_turn:
+			key ^= ZOBRIST_LEADS_TURN
+		if self.__phase == 2:
+			key ^= ZOBRIST_PHASE2
+
+		return key ^ ZOBRIST_POINTS[0][self.__p1_points] ^ ZOBRIST_POINTS[1][self.__p2_points] ^ ZOBRIST_PENDING[0][self.__p1_pending_points] ^ ZOBRIST_PENDING[1][self.__p2_pending_points] ^ ZOBRIST_REVOKED[self.__revoked or 0]
+
+	def canonical(self, player=None):
+		"""
+		Relabels the non-trump suits, which are interchangeable, so that all states that only
+		differ by a permutation of the non-trump suits give the same canonical state.
+
+		Like key(), in phase 1 the relabelling can be based on only the information of the given
+		player, or of the player whose signature this state carries.
+
+		:param player: The player id of the player whose information should be used, or None
+		:return: The canonical state, and a list mapping every suit id of this state to its suit id
+			in the canonical state. Moves can be mapped with util.permute_move.
+		"""
+		permutation = self.__deck.canonical_suits(player if self.__phase == 1 else None)
+
+		return self.__copy(self.__deck.permute_suits(permutation), self.__signature), permutation
+
+	def canonical_key(self, player=None):
+		"""
+		The key() of the canonical state (see canonical). States that only differ by a permutation
+		of the non-trump suits share this key, which makes it the key to use for transposition
+		tables and endgame tables.
+
+		:param player: The player id of the player whose information should be hashed, or None
+		:return: An integer
+		"""
+		return self.canonical(player)[0].key(player)
+
 	def make_assumption(self):
 		"""
 		Takes the current imperfect information state and makes a 
@@ -427,12 +625,33 @@ class State:
 		if self.__signature is None:
 			raise RuntimeError("\n\nCannot make assumption, already have perfect knowledge. Try this in phase 1 or with an un-assumed state")
 
-		state = self.clone()
+		return self.__copy(self.__deck.make_assumption(), None)
 
-		state.__deck = self.__deck.make_assumption()
-		state.__signature = None
+	def sample_worlds(self, n, rng=None):
+		"""
+		Makes n random guesses as to the states of the unknown cards at once.
+		See iter_worlds.
 
-		return state
+		:param n: The number of states to generate
+		:param rng: Optional random.Random instance used for all the guesses
+		:return: A list of n perfect information state objects.
+		"""
+		return list(self.iter_worlds(n, rng))
+
+	def iter_worlds(self, n=None, rng=None):
+		"""
+		Generator form of sample_worlds: yields perfect information states, each a random
+		guess as to the states of the unknown cards, like make_assumption does. Use this to
+		stream guesses without holding all of them, e.g. until a time limit is reached.
+
+		:param n: The number of states to generate. If None, states are generated until the caller stops.
+		:param rng: Optional random.Random instance used for all the guesses. Defaults to the global generator of the random module.
+		:return: A generator of perfect information state objects.
+		"""
+		if self.__signature is None:
+			raise RuntimeError("\n\nCannot make assumption, already have perfect knowledge. Try this in phase 1 or with an un-assumed state")
+
+		return (self.__copy(deck, None) for deck in self.__deck.iter_assumptions(n, rng))
 
 	def __is_valid(self, move):
 		"""
@@ -441,7 +660,7 @@ class State:
 		"""
 		assert not move == None, "The move provided was None"
 		if (self.__phase == 1 or self.__leads_turn) and move[0] is not None and move[1] is None:
-			return (self.__deck.get_card_state(move[0]) == ("P" + str(self.whose_turn()) + "H"))
+			return self.hand_mask() & CARD_BITS[move[0]] != 0
 		return move in self.moves()
 
 	def __exchange_trump(self, trump_jack_index):
@@ -509,14 +728,7 @@ class State:
 		:param trick: A tuple signifying the trick which is used to determine how many points the winner is allocated
 		"""
 
-		# A list containing points of the cards of by rank
-		score = [11, 10, 4, 3, 2]
-
-		rank_first_card_trick = trick[0] % 5
-		rank_second_card_trick = trick[1] % 5
-
-		total_score = score[rank_first_card_trick]
-		total_score += score[rank_second_card_trick]
+		total_score = TRICK_POINTS[trick[0] * 20 + trick[1]]
 
 		self.__add_points(winner, total_score)
 		self.__add_pending_points(winner)
@@ -534,25 +746,19 @@ class State:
 		if trick[0] is None or trick[1] is None:
 			raise RuntimeError("An incomplete trick was attempted to be evaluated.")
 		
-		# If the two cards of the trick have the same suit
-		if Deck.get_suit(trick[0]) == Deck.get_suit(trick[1]):
+		# Since the new leader is determined by the output of this function, at this
+		# point the state object still considers it to be the non-leading player's turn.
+		leader = util.other(self.whose_turn())
+		lead = trick[leader - 1]
+		follow = trick[2 - leader]
 
-			# We only compare indices since the convention we defined in Deck 
-			# puts higher rank cards at lower indices, when considering the same color.
-			return 1 if trick[0] < trick[1] else 2
+		# The table covers all the rules: within a suit the higher rank wins (the convention we
+		# defined in Deck puts higher rank cards at lower indices), otherwise a trump card wins,
+		# and if there is none, the leading card wins. Thanks: Daan Raven
+		if LEAD_WINS[(self.__deck.get_trump_suit_id() * 20 + lead) * 20 + follow]:
+			return leader
 
-		if Deck.get_suit(trick[0]) ==  self.__deck.get_trump_suit():
-			return 1
-
-		if Deck.get_suit(trick[1]) ==  self.__deck.get_trump_suit():
-			return 2
-
-		# If the control flow has reached this point, the trick consists of two
-		# different non-trump cards. Since the new leader is determined by the
-		# output of this function, at this point the state object still considers
-		# it to be the non-leading player's turn. Thus, we determine that the winner
-		# is the other player, i.e. the leading player. Thanks: Daan Raven
-		return util.other(self.whose_turn())
+		return self.whose_turn()
 
 	def set_to_revoked(self):
 		"""
@@ -587,6 +793,65 @@ class State:
 
 		return state
 
+	def to_bytes(self):
+		"""
+		Creates a compact binary representation of the current state, including the
+		perspectives of both players, the signature and the revoked flag. Unlike the JSON
+		representation, this also works for partial information states. Meant for shipping
+		states between processes and for storing large numbers of them.
+
+		:return: A bytes object of length State.BYTES
+		"""
+
+		# Flags: phase 2 in bit 0, leads_turn in bit 1, player1s_turn in bit 2,
+		# revoked in bits 3-4 and signature in bits 5-6
+		flags = (self.__phase == 2) | self.__leads_turn << 1 | self.__player1s_turn << 2 | (self.__revoked or 0) << 3 | (self.__signature or 0) << 5
+
+		return self.__deck.to_bytes() + State.__STRUCT.pack(self.__p1_points, self.__p2_points, self.__p1_pending_points, self.__p2_pending_points, flags)
+
+	@staticmethod
+	def from_bytes(data, offset=0):
+		"""
+		Creates a new state object from the output of to_bytes
+
+		:param data: A bytes-like object holding the encoded state
+		:param offset: The position of the encoded state within data
+		:return: The decoded state
+		"""
+
+		deck = Deck.from_bytes(data, offset)
+		p1_points, p2_points, p1_pending_points, p2_pending_points, flags = State.__STRUCT.unpack_from(data, offset + Deck.BYTES)
+
+		state = State(deck, bool(flags & 4), p1_points, p2_points, p1_pending_points, p2_pending_points)
+		state.__phase = 2 if flags & 1 else 1
+		state.__leads_turn = bool(flags & 2)
+		state.__revoked = (flags >> 3 & 3) or None
+		state.__signature = (flags >> 5 & 3) or None
+
+		return state
+
+	@staticmethod
+	def to_bytes_many(states):
+		"""
+		Encodes a sequence of states with to_bytes into one bytes object. Every state takes
+		State.BYTES bytes, so the result can also be viewed as a (len(states), State.BYTES)
+		array of uint8, e.g. with numpy.frombuffer(data, numpy.uint8).reshape(-1, State.BYTES).
+
+		:param states: An iterable of states
+		:return: The concatenated encodings
+		"""
+		return b"".join([state.to_bytes() for state in states])
+
+	@staticmethod
+	def from_bytes_many(data):
+		"""
+		:param data: A bytes-like object produced by to_bytes_many
+		:return: A list of the decoded states
+		"""
+		if len(data) % State.BYTES != 0:
+			raise ValueError("Encoded states must be a multiple of {} bytes long".format(State.BYTES))
+		return [State.from_bytes(data, offset) for offset in range(0, len(data), State.BYTES)]
+
 	# Equality operator overrides, to check if two different state
 	# objects actually refer to the same state or not.
 	def __eq__(self, o):
@@ -0,0 +1,215 @@
+"""
+Precomputed card tables shared by Deck and State.
+
+Cards are indexed 0-19 as described in Deck. A set of cards is stored as a
+20-bit integer mask in which bit i is set when card i is part of the set.
+"""
+
+import random
+
+# Location codes. Deck keeps one bitmask per location, and the lists
+# holding those masks are indexed by these codes.
+P1H, P2H, S, P1W, P2W, U = range(6)
+
+# The string used for each location code in the (list based) compatibility views
+LOCATIONS = ["P1H", "P2H", "S", "P1W", "P2W", "U"]
+
+LOCATION_CODES = {location: code for code, location in enumerate(LOCATIONS)}
+
+# Hand and won pile location codes, indexed by player id
+HAND = [None, P1H, P2H]
+WON = [None, P1W, P2W]
+
+# CARD_BITS[i] is the mask containing only card i
+CARD_BITS = [1 << i for i in range(20)]
+
+# Suit ids (0-3 for C, D, H, S) and rank ids (0-4 for A, 10, K, Q, J) of every card
+SUIT_IDS = [card // 5 for card in range(20)]
+RANK_IDS = [card % 5 for card in range(20)]
+
+# The points every card is worth when won in a trick
+CARD_POINTS = [[11, 10, 4, 3, 2][rank] for rank in RANK_IDS]
+
+
+def _lead_wins(lead, follow, trump):
+	# Within a suit, higher ranked cards have lower indices
+	if SUIT_IDS[lead] == SUIT_IDS[follow]:
+		return lead < follow
+	# Otherwise a trump wins, and without a trump the suit that was led wins
+	return SUIT_IDS[follow] != trump
+
+# LEAD_WINS[(trump * 20 + lead) * 20 + follow] tells whether the lead card wins the trick
+# against the follow card, given the suit id of the trump suit
+LEAD_WINS = [_lead_wins(lead, follow, trump) for trump in range(4) for lead in range(20) for follow in range(20)]
+
+# TRICK_POINTS[lead * 20 + follow] is the number of points the winner of the trick gets for its cards
+TRICK_POINTS = [CARD_POINTS[lead] + CARD_POINTS[follow] for lead in range(20) for follow in range(20)]
+
+# SUIT_MASKS[s] contains all five cards of suit s (in the order C, D, H, S)
+SUIT_MASKS = [0b11111 << (5 * suit) for suit in range(4)]
+
+# MARRIAGE_MASKS[s] contains the King and the Queen of suit s
+MARRIAGE_MASKS = [CARD_BITS[5 * suit + 2] | CARD_BITS[5 * suit + 3] for suit in range(4)]
+
+# All four Kings. For a hand mask h, h & (h >> 1) & KINGS_MASK holds the Kings whose Queen is in hand as well.
+KINGS_MASK = CARD_BITS[2] | CARD_BITS[7] | CARD_BITS[12] | CARD_BITS[17]
+
+# HIGHER_MASKS[i] contains the cards of the suit of card i that beat card i
+HIGHER_MASKS = [sum(CARD_BITS[higher] for higher in range(5 * SUIT_IDS[card], card)) for card in range(20)]
+
+# Integer move codes: playing card i is encoded as i, a marriage (i, j) as MARRIAGE_CODE + i
+# and a trump jack exchange (None, j) as EXCHANGE_CODE + j.
+MARRIAGE_CODE = 20
+EXCHANGE_CODE = 40
+
+
+# The cards in every possible mask of the lower and the upper ten cards
+LOW_CARDS = [[i for i in range(10) if value & CARD_BITS[i]] for value in range(1024)]
+HIGH_CARDS = [[i + 10 for i in range(10) if value & CARD_BITS[i]] for value in range(1024)]
+
+
+def cards(mask):
+	"""
+	:param mask: A card mask
+	:return: A new list with the indices of the cards in the mask, in ascending order
+	"""
+	return LOW_CARDS[mask & 1023] + HIGH_CARDS[mask >> 10]
+
+
+def count(mask):
+	"""
+	:param mask: A card mask
+	:return: The number of cards in the mask
+	"""
+	return bin(mask).count("1")
+
+
+def from_view(view):
+	"""
+	:param view: A list of 20 location strings, such as a card state list or a perspective
+	:return: A list of six masks indexed by location code, and a bytearray with the location code of each card
+	"""
+	masks = [0] * 6
+	codes = bytearray(20)
+	for index, location in enumerate(view):
+		code = LOCATION_CODES[location]
+		masks[code] |= CARD_BITS[index]
+		codes[index] = code
+	return masks, codes
+
+
+def to_view(codes):
+	"""
+	:param codes: A bytearray with the location code of each card
+	:return: The list of 20 location strings described by the codes
+	"""
+	return [LOCATIONS[code] for code in codes]
+
+
+def from_codes(codes):
+	"""
+	:param codes: A bytearray with the location code of each card
+	:return: A list of six masks indexed by location code
+	"""
+	masks = [0] * 6
+	for index in range(20):
+		masks[codes[index]] |= CARD_BITS[index]
+	return masks
+
+
+# In the binary encoding of a deck, the location codes a card has in the real card state and
+# in both perspectives are packed into one byte: real * 36 + p1 * 6 + p2. These tables, for
+# bytes.translate, take the packed bytes back apart.
+UNPACK_REAL = bytes(value // 36 % 6 for value in range(256))
+UNPACK_P1 = bytes(value // 6 % 6 for value in range(256))
+UNPACK_P2 = bytes(value % 6 for value in range(256))
+
+
+def pack_codes(card_codes, p1_codes, p2_codes):
+	"""
+	:return: The location codes of the three views packed into 20 bytes
+	"""
+	return bytes([real * 36 + p1 * 6 + p2 for real, p1, p2 in zip(card_codes, p1_codes, p2_codes)])
+
+
+def move_card(masks, codes, index, code):
+	"""
+	Moves a card to the given location within one view of the deck.
+
+	:param masks: A list of six masks, indexed by location code. Changed in place.
+	:param codes: A bytearray with the location code of each card. Changed in place.
+	:param index: The index of the card to move
+	:param code: The location code the card is moved to
+	:return: The change to the Zobrist hash of the view
+	"""
+	old = codes[index]
+	masks[old] ^= CARD_BITS[index]
+	masks[code] |= CARD_BITS[index]
+	codes[index] = code
+	return ZOBRIST_LOCATION[old][index] ^ ZOBRIST_LOCATION[code][index]
+
+
+def move_cards(masks, codes, first, second, code):
+	"""
+	Moves two cards, such as the cards of a trick, to the given location within one view of the deck.
+
+	:return: The change to the Zobrist hash of the view
+	"""
+	first_old = codes[first]
+	second_old = codes[second]
+	masks[first_old] ^= CARD_BITS[first]
+	masks[second_old] ^= CARD_BITS[second]
+	masks[code] |= CARD_BITS[first] | CARD_BITS[second]
+	codes[first] = codes[second] = code
+	return ZOBRIST_LOCATION[first_old][first] ^ ZOBRIST_LOCATION[code][first] ^ ZOBRIST_LOCATION[second_old][second] ^ ZOBRIST_LOCATION[code][second]
+
+
+def move_card_pair(masks, codes, first, first_code, second, second_code):
+	"""
+	Moves two cards to their own locations within one view of the deck, such as the cards of a
+	trick back to the hands they were played from.
+
+	:return: The change to the Zobrist hash of the view
+	"""
+	first_old = codes[first]
+	second_old = codes[second]
+	masks[first_old] ^= CARD_BITS[first]
+	masks[second_old] ^= CARD_BITS[second]
+	masks[first_code] |= CARD_BITS[first]
+	masks[second_code] |= CARD_BITS[second]
+	codes[first] = first_code
+	codes[second] = second_code
+	return ZOBRIST_LOCATION[first_old][first] ^ ZOBRIST_LOCATION[first_code][first] ^ ZOBRIST_LOCATION[second_old][second] ^ ZOBRIST_LOCATION[second_code][second]
+
+
+# Zobrist keys: random 64-bit numbers, one for each feature a state can have. The hash of a
+# state is the XOR of the keys of its features, so it can be updated with a few XORs whenever a
+# feature changes. The generator is seeded so the keys are the same in every process.
+_zobrist = random.Random(20222022)
+
+
+def _zobrist_keys(n):
+	return [_zobrist.getrandbits(64) for i in range(n)]
+
+
+# ZOBRIST_LOCATION[code][i]: card i is in the location with the given code
+ZOBRIST_LOCATION = [_zobrist_keys(20) for code in range(6)]
+
+# ZOBRIST_STOCK[position][i]: card i is at the given position of the stock (0 is the trump card)
+ZOBRIST_STOCK = [_zobrist_keys(20) for position in range(10)]
+
+# ZOBRIST_TRICK[player - 1][i]: card i is played by the given player in the current trick
+ZOBRIST_TRICK = [_zobrist_keys(20) for player in range(2)]
+
+# ZOBRIST_TRUMP[suit]: the trump suit, in the order C, D, H, S
+ZOBRIST_TRUMP = _zobrist_keys(4)
+
+# ZOBRIST_POINTS[player - 1][points] and ZOBRIST_PENDING[player - 1][points]: the (pending) points of a player
+ZOBRIST_POINTS = [_zobrist_keys(256) for player in range(2)]
+ZOBRIST_PENDING = [_zobrist_keys(256) for player in range(2)]
+
+# Single keys for the remaining parts of a state
+ZOBRIST_PLAYER1S_TURN, ZOBRIST_LEADS_TURN, ZOBRIST_PHASE2 = _zobrist_keys(3)
+
+# ZOBRIST_REVOKED[player]: the given player made an illegal move
+ZOBRIST_REVOKED = [0] + _zobrist_keys(2)
@@ -0,0 +1,287 @@
+"""
+A vectorized engine that plays many games of Schnapsen at once.
+
+BatchState holds N perfect information games as numpy arrays, one row per
+game, and makes a move in all of them with a handful of array operations.
+This makes it cheap to run large numbers of random rollouts. The rules
+are the same as those of State, and a step gives exactly the state
+State.next would give. The perspectives of the players are not tracked.
+
+Moves are given as the integer codes of State.moves(encoded=True), see
+util.encode_move.
+"""
+
+import numpy as np
+
+from api import State, Deck
+from api._tables import S, P1W, SUIT_IDS, LEAD_WINS, TRICK_POINTS, MARRIAGE_CODE, EXCHANGE_CODE
+
+# The number of distinct integer move codes, and so the width of a legal move mask
+MOVES = 60
+
+_CARDS = np.arange(20)
+_KINGS = np.array([2, 7, 12, 17])
+_SUIT_IDS = np.array(SUIT_IDS, dtype=np.intp)
+_LEAD_WINS = np.array(LEAD_WINS, dtype=bool)
+_TRICK_POINTS = np.array(TRICK_POINTS, dtype=np.int16)
+
+
+def _first_nonempty(*masks):
+	"""
+	:param masks: Boolean arrays of shape (N, 20), in order of preference
+	:return: For every row, the row of the first mask in which it has a set element (or of the last mask)
+	"""
+	result = masks[-1]
+	for mask in reversed(masks[:-1]):
+		result = np.where(mask.any(axis=1)[:, None], mask, result)
+	return result
+
+
+class BatchState:
+	"""
+	N games stored as a structure of arrays. Every array has one row per game:
+
+	locations:		int8 (N, 20), the location code (see api._tables) of every card
+	stock:			int8 (N, 10), the stock in the same order as in Deck, padded with -1
+	stock_size:		int64 (N,), the number of cards in the stock
+	trick:			int8 (N, 2), the cards played by player 1 and 2 in the current trick, -1 if none
+	previous_trick:	int8 (N, 2), the previous trick, -1 if none
+	trump:			int64 (N,), the suit id of the trump suit
+	points:			int16 (N, 2), the points of player 1 and 2
+	pending_points:	int16 (N, 2), the pending points of player 1 and 2
+	phase:			int8 (N,), the phase the game is in (1 or 2)
+	leads_turn:		bool (N,), whether it is the turn of the leading player
+	player1s_turn:	bool (N,), whether it is player 1's turn
+	revoked:		int8 (N,), the player who made an illegal move, 0 if none
+	"""
+
+	def __init__(self, locations, stock, stock_size, trick, previous_trick, trump, points, pending_points, phase, leads_turn, player1s_turn, revoked):
+		self.locations = locations
+		self.stock = stock
+		self.stock_size = stock_size
+		self.trick = trick
+		self.previous_trick = previous_trick
+		self.trump = trump
+		self.points = points
+		self.pending_points = pending_points
+		self.phase = phase
+		self.leads_turn = leads_turn
+		self.player1s_turn = player1s_turn
+		self.revoked = revoked
+
+	@staticmethod
+	def from_states(states):
+		"""
+		:param states: A sequence of perfect information states
+		:return: A BatchState holding a copy of every state, in the same order
+		"""
+		return BatchState.from_bytes(State.to_bytes_many(states))
+
+	@staticmethod
+	def from_bytes(data):
+		"""
+		:param data: Perfect information states encoded with State.to_bytes_many
+		:return: A BatchState holding the decoded states
+		"""
+		raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, State.BYTES)
+
+		# The fields of Deck.to_bytes, followed by those of State.to_bytes
+		deck_flags = raw[:, 34]
+		if (deck_flags & 12).any():
+			raise ValueError("A BatchState can only hold perfect information states.")
+
+		previous_trick = raw[:, 32:34].astype(np.int8)
+		previous_trick[(deck_flags & 16) != 0] = -1
+
+		state_flags = raw[:, Deck.BYTES + 4]
+
+		return BatchState(
+			(raw[:, :20] // 36).astype(np.int8),
+			raw[:, 20:30].astype(np.int8),
+			(raw[:, 20:30] != 255).sum(axis=1),
+			raw[:, 30:32].astype(np.int8),
+			previous_trick,
+			(deck_flags & 3).astype(np.int64),
+			raw[:, Deck.BYTES:Deck.BYTES + 2].astype(np.int16),
+			raw[:, Deck.BYTES + 2:Deck.BYTES + 4].astype(np.int16),
+			(1 + (state_flags & 1)).astype(np.int8),
+			(state_flags & 2) != 0,
+			(state_flags & 4) != 0,
+			((state_flags >> 3) & 3).astype(np.int8))
+
+	def copy(self):
+		"""
+		:return: A deep copy of this batch
+		"""
+		return BatchState(*[array.copy() for array in (self.locations, self.stock, self.stock_size, self.trick, self.previous_trick, self.trump, self.points, self.pending_points, self.phase, self.leads_turn, self.player1s_turn, self.revoked)])
+
+	def __len__(self):
+		return len(self.locations)
+
+	def whose_turn(self):
+		"""
+		:return: An int64 (N,) array with the id of the player whose turn it is in every game
+		"""
+		return np.where(self.player1s_turn, 1, 2)
+
+	def finished(self):
+		"""
+		:return: A bool (N,) array indicating which games are finished
+		"""
+		return (self.revoked != 0) | (self.points >= 66).any(axis=1)
+
+	def winner(self):
+		"""
+		:return: Two int64 (N,) arrays: the id of the winner of every game and the number of game
+			points won (see State.winner). Both are 0 for unfinished games.
+		"""
+		revoked = self.revoked != 0
+		winner = np.where(self.points[:, 0] >= 66, 1, np.where(self.points[:, 1] >= 66, 2, 0))
+		winner = np.where(revoked, 3 - self.revoked, winner)
+
+		other_points = self.points[np.arange(len(self)), 2 - np.maximum(winner, 1)]
+		game_points = np.where(other_points == 0, 3, np.where(other_points < 33, 2, 1))
+		game_points = np.where(revoked, 3, np.where(winner == 0, 0, game_points))
+
+		return winner, game_points
+
+	def legal_move_mask(self):
+		"""
+		:return: A bool (N, MOVES) array in which element [i, m] tells whether move code m is a
+			legal move in game i. Finished games have no legal moves.
+		"""
+		rows = np.arange(len(self))
+		turn = self.whose_turn()
+
+		# P1H and P2H are location codes 0 and 1
+		hand = self.locations == (turn - 1)[:, None]
+
+		# Without constraints on the move, any card in hand can be played
+		free = (self.phase == 1) | self.leads_turn
+
+		# Otherwise, a higher card of the suit of the opponent's card must be played if
+		# there is one, otherwise a card of that suit, otherwise a trump card, otherwise any card
+		opponent_card = self.trick[rows, 2 - turn].astype(np.intp)
+		same_suit = hand & (_SUIT_IDS[None, :] == _SUIT_IDS[opponent_card][:, None])
+		higher = same_suit & (_CARDS[None, :] < opponent_card[:, None])
+		trumps = hand & (_SUIT_IDS[None, :] == self.trump[:, None])
+
+		mask = np.zeros((len(self), MOVES), dtype=bool)
+		mask[:, :20] = np.where(free[:, None], hand, _first_nonempty(higher, same_suit, trumps, hand))
+
+		# Marriages and exchanges can only be made by the leading player
+		leader_hand = hand & self.leads_turn[:, None]
+
+		marriages = leader_hand[:, _KINGS] & leader_hand[:, _KINGS + 1]
+		mask[:, MARRIAGE_CODE + _KINGS] = marriages
+		mask[:, MARRIAGE_CODE + _KINGS + 1] = marriages
+
+		trump_jack = self.trump * 5 + 4
+		mask[rows, EXCHANGE_CODE + trump_jack] = leader_hand[rows, trump_jack] & (self.stock_size > 0)
+
+		mask[self.finished()] = False
+
+		return mask
+
+	def step(self, moves):
+		"""
+		Makes one move in every unfinished game, in place. An illegal move revokes the game,
+		like it does in State.next.
+
+		:param moves: An integer (N,) array with a move code for every game. Ignored for finished games.
+		"""
+		moves = np.asarray(moves, dtype=np.intp)
+		rows = np.arange(len(self))
+		turn = self.whose_turn()
+
+		active = ~self.finished()
+		legal = active & self.legal_move_mask()[rows, np.where(active, moves, 0)]
+
+		illegal = active & ~legal
+		self.revoked[illegal] = turn[illegal]
+
+		# Trump jack exchanges swap the trump jack with the trump card, the turn does not change
+		exchanges = rows[legal & (moves >= EXCHANGE_CODE)]
+		trump_jack = moves[exchanges] - EXCHANGE_CODE
+		trump_card = self.stock[exchanges, 0].astype(np.intp)
+		self.locations[exchanges, trump_card] = self.locations[exchanges, trump_jack]
+		self.locations[exchanges, trump_jack] = S
+		self.stock[exchanges, 0] = trump_jack
+		# Like Deck.exchange_trump, which clears the previous trick to mark the exchange
+		self.previous_trick[exchanges] = -1
+
+		# All other moves put a card in the trick
+		played = legal & (moves < EXCHANGE_CODE)
+		rows = rows[played]
+		turn = turn[played]
+		move = moves[played]
+		card = move % 20
+
+		self.leads_turn[rows] = ~self.leads_turn[rows]
+		self.trick[rows, turn - 1] = card
+
+		# Trump suit marriage yields 40 points, regular yields 20, to be awarded at next trick win.
+		marriage_points = np.where(_SUIT_IDS[card] == self.trump[rows], 40, 20)
+		self.pending_points[rows, turn - 1] += np.where(move >= MARRIAGE_CODE, marriage_points, 0).astype(np.int16)
+
+		# After a lead, it is the other player's turn
+		led = ~self.leads_turn[rows]
+		self.player1s_turn[rows[led]] = ~self.player1s_turn[rows[led]]
+
+		# After a follow, the trick is complete and can be evaluated
+		rows = rows[~led]
+		follower = turn[~led]
+		leader = 3 - follower
+
+		lead = self.trick[rows, leader - 1].astype(np.intp)
+		follow = self.trick[rows, follower - 1].astype(np.intp)
+
+		winner = np.where(_LEAD_WINS[(self.trump[rows] * 20 + lead) * 20 + follow], leader, follower)
+		won = winner - 1
+
+		self.points[rows, won] += _TRICK_POINTS[lead * 20 + follow] + self.pending_points[rows, won]
+		self.pending_points[rows, won] = 0
+
+		self.locations[rows, lead] = P1W + won
+		self.locations[rows, follow] = P1W + won
+		self.previous_trick[rows] = self.trick[rows]
+		self.trick[rows] = -1
+
+		# If all cards are exhausted, the winner of the last trick wins the game
+		last = (self.phase[rows] == 2) & ~(self.locations[rows] <= 1).any(axis=1) & (self.points[rows] < 66).all(axis=1)
+		self.points[rows[last], won[last]] = 66
+
+		# Draw cards from stock, the winner of the trick first
+		drawing = self.phase[rows] == 1
+		draws = rows[drawing]
+		size = self.stock_size[draws]
+		self.locations[draws, self.stock[draws, size - 1].astype(np.intp)] = won[drawing]
+		self.locations[draws, self.stock[draws, size - 2].astype(np.intp)] = 1 - won[drawing]
+		self.stock[draws, size - 1] = -1
+		self.stock[draws, size - 2] = -1
+		self.stock_size[draws] -= 2
+		self.phase[draws[self.stock_size[draws] == 0]] = 2
+
+		self.player1s_turn[rows] = winner == 1
+
+	def random_step(self, rng=None):
+		"""
+		Makes a uniformly random legal move in every unfinished game, in place.
+
+		:param rng: Optional numpy.random.Generator
+		:return: An int64 (N,) array with the move code played in every game, -1 for finished games
+		"""
+		if rng is None:
+			rng = np.random.default_rng()
+
+		mask = self.legal_move_mask()
+
+		# The legal move with the highest random number is a uniform choice among the legal moves
+		scores = rng.random(mask.shape)
+		scores[~mask] = -1.0
+		moves = scores.argmax(axis=1)
+		moves[~mask.any(axis=1)] = -1
+
+		self.step(moves)
+
+		return moves
@@ -2,8 +2,8 @@
 This file contains functions to regulate game play.
 """
 from api import State, Deck, util
-from multiprocessing import Process, Manager
-import random
+from multiprocessing import Process, Pipe, RawValue
+import gc, os, pickle, random, signal, time, traceback
 
 def play(
             player1,            # type: Bot
@@ -11,46 +11,87 @@ def play(
             state,              # type: State
             max_time=5000,      # type: int
             verbose=True,       # type: bool
-            fast=False          # type: bool
+            fast=False,         # type: bool
+            workers=None,       # type: tuple[BotWorker, BotWorker]
+            on_move=None,       # type: function
+            ponder=False,       # type: bool
+            deadlines=False     # type: bool
         ):
     """
     Play a game between two given players, from the given starting state.
+
+    If workers are given (a BotWorker for player 1 and one for player 2), the moves are
+    asked from those long-running processes instead of from a new process for every move.
+    With ponder, the bot that waits for the opponent's move after every move can think
+    about the state in its worker meanwhile (see BotWorker.ponder).
+
+    With deadlines, bots whose get_move takes a deadline argument (see util.accepts_deadline) get
+    the absolute time by which they must return their move, on the clock of time.monotonic, and
+    may use the time left to search further. Without it, they get no deadline and do their usual,
+    fixed amount of work. In fast mode the time limit is not enforced, so they never get a deadline.
+
+    If on_move is given, it is called after every move a bot returns as
+    on_move(player, state, move, seconds): the id of the player, the state the bot was
+    given, the move it returned and the time in seconds it took to get the move.
     """
     pr('player1: {}'.format(player1), verbose)
     pr('player2: {}'.format(player2), verbose)
 
 
-    # The game loop
-    while not state.finished():
+    try:
+        # The game loop
+        while not state.finished():
 
-        player = player1 if state.whose_turn() == 1 else player2
+            player = player1 if state.whose_turn() == 1 else player2
 
-        # We introduce a state signature which essentially obscures the deck's perfect knowledge from the player
-        given_state = state.clone(signature=state.whose_turn()) if state.get_phase() == 1 else state.clone()
+            # We introduce a state signature which essentially obscures the deck's perfect knowledge from the player
+            given_state = state.clone(signature=state.whose_turn()) if state.get_phase() == 1 else state.clone()
 
-        move = player.get_move(given_state) if fast else get_move(given_state, player, max_time, verbose)
+            start = time.perf_counter()
+            deadline = util.deadline_in(max_time / 1000) if deadlines else None
+
+            if fast:
+                move = player.get_move(given_state)
+            elif workers is not None:
+                move = workers[state.whose_turn() - 1].get_move(given_state, max_time, verbose, deadline=deadline)
+            else:
+                move = get_move(given_state, player, max_time, verbose, deadline=deadline)
 
-        if is_valid(move, player): # check for common mistakes
+            if on_move is not None:
+                on_move(state.whose_turn(), given_state, move, time.perf_counter() - start)
 
+            if is_valid(move, player): # check for common mistakes
 
-            if move[0] is None:
-                pr('*   Player {} performs a trump jack exchange'.format(state.whose_turn()), verbose)
+
+                if move[0] is None:
+                    pr('*   Player {} performs a trump jack exchange'.format(state.whose_turn()), verbose)
             
-            else:
-                pr('*   Player {} plays: {}{}'.format(state.whose_turn(), util.get_rank(move[0]), util.get_suit(move[0])), verbose)
+                else:
+                    pr('*   Player {} plays: {}{}'.format(state.whose_turn(), util.get_rank(move[0]), util.get_suit(move[0])), verbose)
                 
-                if move[1] is not None:
-                    pr('*   Player {} melds a marriage between {}{} and {}{}'.format(state.whose_turn(), util.get_rank(move[0]), util.get_suit(move[0]), util.get_rank(move[1]), util.get_suit(move[1])), verbose)
+                    if move[1] is not None:
+                        pr('*   Player {} melds a marriage between {}{} and {}{}'.format(state.whose_turn(), util.get_rank(move[0]), util.get_suit(move[0]), util.get_rank(move[1]), util.get_suit(move[1])), verbose)
 
-            state = state.next(move)
-            pr(state, verbose)
+                state = state.next(move)
+                pr(state, verbose)
 
-            if not state.revoked() is None:
-                pr('!   Player {} revoked (made illegal move), game finished.'.format(state.revoked()), verbose)
+                if ponder and workers is not None and not fast and not state.finished():
+                    # The waiting bot gets the state as it would see it
+                    waiting = util.other(state.whose_turn())
+                    workers[waiting - 1].ponder(state.clone(signature=waiting) if state.get_phase() == 1 else state.clone())
+
+                if not state.revoked() is None:
+                    pr('!   Player {} revoked (made illegal move), game finished.'.format(state.revoked()), verbose)
         
-        else:
-            state.set_to_revoked()
+            else:
+                state.set_to_revoked()
 
+    finally:
+        # A bot that ponders keeps going until its next request, which may not come for a
+        # while (e.g. in a tournament it does not play the next game), so it is stopped here
+        if ponder and workers is not None:
+            for worker in workers:
+                worker.stop_ponder()
 
 
     pr('Game finished. Player {} has won, receiving {} points.'.format(state.winner()[0], state.winner()[1]), verbose)
@@ -58,55 +99,418 @@ def play(
 
     return state.winner()
 
-def get_move(state, player, max_time, verbose):
+def play_match(
+            player1,            # type: Bot
+            player2,            # type: Bot
+            seed=None,          # type: int
+            points=7,           # type: int
+            phase=1,            # type: int
+            max_time=5000,      # type: int
+            verbose=True,       # type: bool
+            fast=False,         # type: bool
+            workers=None,       # type: tuple[BotWorker, BotWorker]
+            on_move=None,       # type: function
+            ponder=False,       # type: bool
+            deadlines=False     # type: bool
+        ):
+    """
+    Play a full match between two given players: rounds are played until one of them has
+    received the given number of game points (1-3 for every round won, see State.winner).
+
+    Every round is dealt from a seed drawn from a generator with the given seed. The player
+    who starts the first round is drawn as well, and after that the start alternates, as the
+    deal does in the rules. The other parameters are those of play.
+
+    :return: The id of the winning player, a list with the game points of player 1 and
+        player 2, and the number of rounds played
+    """
+    rng = random.Random(seed)
+    starting_player = rng.choice([1, 2])
+
+    match_points = [0, 0]
+    rounds = 0
+
+    while max(match_points) < points:
+        state = State.generate(rng.getrandbits(32), phase=phase, startingPlayer=starting_player)
+
+        winner, game_points = play(player1, player2, state, max_time, verbose, fast, workers, on_move, ponder, deadlines)
+        match_points[winner - 1] += game_points
+        rounds += 1
+
+        pr('Round {} finished. The match stands at {}-{}.'.format(rounds, match_points[0], match_points[1]), verbose)
+
+        starting_player = 3 - starting_player
+
+    winner = 1 if match_points[0] >= points else 2
+    pr('Match finished. Player {} has won, {}-{} after {} rounds.'.format(winner, match_points[0], match_points[1], rounds), verbose)
+
+    return winner, match_points, rounds
+
+def get_move(state, player, max_time, verbose, deadline=None):
     """
     Asks a player bot for a move. Creates a separate process, so we can kill
     computation if it exceeds a maximum time.
     :param state:
     :param player:
+    :param deadline: The deadline passed on to bots that take one, see util.call_get_move
     :return:
     """
     # We call the player bot in a separate process.This allows us to terminate
-    # if the player takes too long.
-    manager = Manager()
-    result = manager.dict() # result is a variable shared between our process and
-                            # the player's. This allows it to pass the move to us
+    # if the player takes too long. The state goes to the process in its binary encoding, and
+    # the move comes back over a pipe (see send_move).
+    connection, child_connection = Pipe(duplex=False)
 
     # Start a process with the function 'call_player' and the given arguments
-    # We also give it the state of the global PRNG to ensure execution is deterministic whenever no timeouts happen
-    #we make a call to random to ensure that next invocations of get_move will give start with a different state of the rng
-    random.random()
-    process = Process(target=call_player, args=(player, state, random.getstate(),  result))
+    # We also give it a seed for its global PRNG, drawn from ours, to ensure execution is deterministic whenever
+    # no timeouts happen. Drawing it also ensures that next invocations of get_move start with a different seed.
+    # A 64-bit seed is much smaller to send than the state of the PRNG (about 3.8 KB pickled).
+    process = Process(target=call_player, args=(player, state.to_bytes(), random.getrandbits(64), child_connection, deadline))
 
     # Start the process
     process.start()
+    child_connection.close()
 
-    # Rejoin at most max_time miliseconds later
-    process.join(max_time / 1000)
-
-    # Check if the process terminated in time
+    # Wait at most max_time miliseconds for the move
     move = None
-    if process.is_alive():
+    if not connection.poll(max_time / 1000):
         pr('!   Player {} took too long, game revoked.'.format(state.whose_turn()), verbose)
 
         process.terminate()
-        process.join()
         move = "Late"
 
     else:
-        # extract the move
-        if 'move' in result:
-            move = result['move']
+        # extract the move (the process ends without one if the bot raised an exception)
+        try:
+            move = receive_move(connection)
+        except EOFError:
+            pass
+
+    process.join()
+    connection.close()
 
     return move
 
-def call_player(player, state, randomState, result):
-    random.setstate(randomState)
+def send_move(connection, move):
+    """
+    Sends a move over a pipe. A well-formed move is sent as its one-byte integer code (see
+    util.encode_move), anything else a bot may return is pickled, so the engine receives it as
+    it is and is_valid can report it.
+    """
+    # Only a pair of ints and Nones has a code. Other values could compare equal to a
+    # well-formed move, e.g. (True, None) to (1, None), and would arrive as that move.
+    if type(move) is tuple and len(move) == 2 and all(card is None or type(card) is int for card in move):
+        try:
+            code = util.encode_move(move)
+            if util.decode_move(code) == move and 0 <= code < 256:
+                connection.send_bytes(bytes([code]))
+                return
+        except (TypeError, IndexError, KeyError):
+            pass
+
+    connection.send_bytes(pickle.dumps(move))
+
+def receive_move(connection):
+    """
+    Receives a move sent with send_move.
+    """
+    data = connection.recv_bytes()
+    # A pickle takes more than one byte
+    if len(data) == 1:
+        return util.decode_move(data[0])
+    return pickle.loads(data)
+
+class BotWorker:
+    """
+    Keeps a bot in one long-running child process, so that it can be asked for many moves
+    (e.g. for a whole match or tournament) without starting a new process, and pickling the
+    bot, for every move. The states are sent over a pipe in their binary encoding.
+
+    The time limit is enforced like in get_move: a worker that takes too long is killed and
+    replaced by a new one, with a fresh copy of the bot. Note that, unlike with get_move,
+    changes a bot makes to itself while choosing a move are kept for the next move.
+
+    A bot with a ponder(state, stop) method can think while it waits for the opponent, see ponder.
+    """
+    def __init__(self, player):
+        self.__player = player
+        self.__can_ponder = callable(getattr(player, 'ponder', None))
+
+        # Every request to the worker gets the next number. A ponder call stops as soon as this
+        # number changes, i.e. when another request is on its way.
+        self.__requests = RawValue('l', 0)
+
+        self.__start()
+
+    def __start(self):
+        self.__connection, child_connection = Pipe()
+        self.__process = Process(target=serve_player, args=(self.__player, child_connection, self.__requests))
+        self.__process.daemon = True
+        self.__process.start()
+
+    def __restart(self):
+        self.__process.terminate()
+        self.__process.join()
+        self.__connection.close()
+        self.__start()
+
+    def get_move(self, state, max_time, verbose, deadline=None):
+        """
+        Asks the bot for a move, like get_move does.
+        :param state:
+        :param max_time: The time limit in milliseconds
+        :param verbose:
+        :param deadline: The deadline passed on to bots that take one, see util.call_get_move
+        :return: The move, or "Late" if the bot took too long
+        """
+        # Stop pondering, the worker answers as soon as the ponder call returns
+        self.__requests.value += 1
+
+        # As in get_move, the bot gets a seed for its global PRNG to keep execution deterministic
+        self.__connection.send(('move', state.to_bytes(), random.getrandbits(64), deadline))
+
+        # Wait at most max_time miliseconds for the move
+        if not self.__connection.poll(max_time / 1000):
+            pr('!   Player {} took too long, game revoked.'.format(state.whose_turn()), verbose)
+            self.__restart()
+            return "Late"
+
+        try:
+            return receive_move(self.__connection)
+        except EOFError:
+            # The worker died without answering
+            self.__restart()
+            return None
+
+    def ponder(self, state):
+        """
+        Lets the bot think about the given state while the opponent chooses a move, if the bot has
+        a ponder(state, stop) method. Returns right away: the bot ponders in its worker process
+        until the next request arrives. It is called as ponder(state, stop), where stop() tells
+        whether it should return. Whatever the bot keeps in its own attributes, such as a cache of
+        evaluations, is still there when it is asked for its next move.
+
+        :param state: The state the opponent is to move in, as the bot may see it
+        """
+        if not self.__can_ponder:
+            return
+
+        self.__requests.value += 1
+        self.__connection.send(('ponder', state.to_bytes(), self.__requests.value))
+
+    def stop_ponder(self):
+        """
+        Stops the bot from pondering, if it is, without asking it anything else.
+        """
+        self.__requests.value += 1
+
+    def close(self):
+        """
+        Stops the worker process.
+        """
+        self.__requests.value += 1
+        try:
+            self.__connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.__process.join(1)
+        if self.__process.is_alive():
+            self.__process.terminate()
+            self.__process.join()
+        self.__connection.close()
+
+def serve_player(player, connection, requests):
+    """
+    The loop run by a BotWorker process: receives encoded states and answers with the bot's moves,
+    or ponders on them, until it receives None.
+    """
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        if request[0] == 'ponder':
+            data, number = request[1:]
+
+            try:
+                player.ponder(State.from_bytes(data), lambda: requests.value != number)
+            except Exception:
+                traceback.print_exc()
+
+            continue
+
+        data, seed, deadline = request[1:]
+        random.seed(seed)
+
+        try:
+            move = util.call_get_move(player, State.from_bytes(data), deadline)
+        except Exception:
+            traceback.print_exc()
+            move = None
+
+        send_move(connection, move)
+
+class ForkServer:
+    """
+    A template process that loads the bots once, and forks a copy of itself for every move.
+    As with get_move, every move is made by a new process with a fresh copy of the bot, but
+    the bots are not imported, created (e.g. loading a model from disk) or pickled again for
+    every move. The template calls gc.freeze() after loading the bots, so the garbage
+    collector of the forked processes leaves their objects alone, and the memory pages
+    holding them stay shared with the template instead of being copied.
+
+    This needs os.fork, so it is not available on Windows.
+    """
+    def __init__(self, names):
+        """
+        :param names: The names of the bots to load, see util.load_player
+        """
+        self.__names = names
+        self.__start()
+
+    def __start(self):
+        self.__connection, child_connection = Pipe()
+        self.__process = Process(target=serve_forks, args=(self.__names, child_connection))
+        self.__process.daemon = True
+        self.__process.start()
+        child_connection.close()
+
+        # Wait until the bots are loaded, so this time does not count for the first move
+        try:
+            self.__connection.recv()
+        except EOFError:
+            self.__process.join()
+            raise RuntimeError('The fork server could not load the bots {}'.format(self.__names))
+
+    def __restart(self, pid):
+        if pid is not None:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        self.__process.terminate()
+        self.__process.join()
+        self.__connection.close()
+        self.__start()
+
+    def get_move(self, index, state, max_time, verbose, deadline=None):
+        """
+        Asks a bot for a move, like get_move does.
+        :param index: The index of the bot in the names the server was created with
+        :param state:
+        :param max_time: The time limit in milliseconds
+        :param verbose:
+        :param deadline: The deadline passed on to bots that take one, see util.call_get_move
+        :return: The move, or "Late" if the bot took too long
+        """
+        # As in get_move, the bot gets a seed for its global PRNG to keep execution deterministic
+        self.__connection.send((index, state.to_bytes(), random.getrandbits(64), deadline))
+
+        # The forked process first sends its pid, so it can be killed if it takes too long
+        end = time.monotonic() + max_time / 1000
+        pid = None
+        while True:
+            if not self.__connection.poll(max(end - time.monotonic(), 0)):
+                pr('!   Player {} took too long, game revoked.'.format(state.whose_turn()), verbose)
+                # The process may be sending its move right now, so the pipe is not trusted anymore
+                self.__restart(pid)
+                return "Late"
+
+            try:
+                if pid is None:
+                    pid = self.__connection.recv()
+                else:
+                    return receive_move(self.__connection)
+            except EOFError:
+                # The template died
+                self.__restart(pid)
+                return None
+
+    def seat(self, index):
+        """
+        :return: An object that asks the bot with the given index for its moves, to be given to
+            play as one of the workers
+        """
+        return ForkServerSeat(self, index)
+
+    def close(self):
+        """
+        Stops the template process.
+        """
+        try:
+            self.__connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.__process.join(1)
+        if self.__process.is_alive():
+            self.__process.terminate()
+            self.__process.join()
+        self.__connection.close()
+
+class ForkServerSeat:
+    """
+    One bot of a ForkServer, with the interface of a BotWorker.
+    """
+    def __init__(self, server, index):
+        self.__server = server
+        self.__index = index
+
+    def get_move(self, state, max_time, verbose, deadline=None):
+        return self.__server.get_move(self.__index, state, max_time, verbose, deadline)
+
+    def ponder(self, state):
+        # A new process is made for every move, so there is nothing to ponder in
+        pass
+
+    def stop_ponder(self):
+        pass
+
+def serve_forks(names, connection):
+    """
+    The loop run by the template process of a ForkServer: loads the bots, and forks a process
+    for every request it receives, until it receives None.
+    """
+    players = [util.load_player(name) for name in names]
+
+    # Finished children are cleaned up automatically
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    gc.collect()
+    gc.freeze()
+
+    connection.send('ready')
+
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+
+        if os.fork() != 0:
+            continue
+
+        # In the forked process
+        try:
+            connection.send(os.getpid())
+
+            index, data, seed, deadline = request
+            random.seed(seed)
+
+            try:
+                move = util.call_get_move(players[index], State.from_bytes(data), deadline)
+            except Exception:
+                traceback.print_exc()
+                move = None
+
+            send_move(connection, move)
+        finally:
+            os._exit(0)
+
+def call_player(player, data, seed, connection, deadline=None):
+    random.seed(seed)
     # Call the player to make the move
-    move = player.get_move(state)
-    # Put the move in the shared variable, so it can be read by the
-    # engine process
-    result['move'] = move
+    move = util.call_get_move(player, State.from_bytes(data), deadline)
+    # Send the move back to the engine process
+    send_move(connection, move)
+    connection.close()
 
 
 def pr(string, verbose):
@@ -0,0 +1,102 @@
+"""
+Elo ratings for bots, updated after every game.
+
+The ratings can be kept in a local SQLite database (which may be the same
+file as a ResultStore), so they carry over from one tournament to the next.
+A new bot can then be rated by playing it against a few bots with
+established ratings, instead of against every other bot.
+"""
+
+import sqlite3
+
+from api import stats
+
+
+class Ratings:
+	"""
+	The Elo rating and the number of rated games of every bot, referred to by its name. After a game,
+	the winner gains k * (1 - E) points and the loser loses as many, where E is the win probability
+	the ratings gave the winner before the game.
+
+	Since every update depends on the ratings before it, the ratings after a set of games depend
+	slightly on the order in which the games finished.
+	"""
+
+	__SCHEMA = """
+		CREATE TABLE IF NOT EXISTS ratings (
+			name TEXT PRIMARY KEY,
+			rating REAL NOT NULL,
+			games INTEGER NOT NULL
+		)
+	"""
+
+	def __init__(self, path=None, k=20.0, initial=1500.0):
+		"""
+		:param path: The path of the database file the ratings are kept in. It is created if it does not
+			exist yet. If None, the ratings are only kept in memory.
+		:param k: The largest possible change of a rating after one game
+		:param initial: The rating of a bot that has not played a rated game yet
+		"""
+		self.k = k
+		self.initial = initial
+
+		self.__ratings = {}
+		self.__connection = None
+
+		if path is not None:
+			self.__connection = sqlite3.connect(path)
+			self.__connection.execute(self.__SCHEMA)
+			self.__connection.commit()
+
+			for name, rating, games in self.__connection.execute("SELECT name, rating, games FROM ratings"):
+				self.__ratings[name] = [rating, games]
+
+	def rating(self, name):
+		"""
+		:return: The current rating of the bot with the given name
+		"""
+		return self.__ratings.get(name, [self.initial, 0])[0]
+
+	def games(self, name):
+		"""
+		:return: The number of rated games the bot with the given name played
+		"""
+		return self.__ratings.get(name, [self.initial, 0])[1]
+
+	def update(self, player1, player2, score, fixed=()):
+		"""
+		Updates the ratings of two bots after a game between them, and saves them right away.
+
+		:param player1: The name of one bot
+		:param player2: The name of the other bot
+		:param score: The result of player1: 1 for a win, 0 for a loss and 0.5 for a draw (or the
+			average result of several games, such as a duplicate deal)
+		:param fixed: The names of bots whose ratings do not change, such as the established
+			opponents of a new bot
+		:return: The change to the rating of player1 (the rating of player2 changes by the opposite amount)
+		"""
+		change = self.k * (score - stats.expected_score(self.rating(player1) - self.rating(player2)))
+
+		for name, delta in ((player1, change), (player2, -change)):
+			entry = self.__ratings.setdefault(name, [self.initial, 0])
+			if name not in fixed:
+				entry[0] += delta
+			entry[1] += 1
+
+			if self.__connection is not None:
+				self.__connection.execute("INSERT OR REPLACE INTO ratings (name, rating, games) VALUES (?, ?, ?)", (name, entry[0], entry[1]))
+
+		if self.__connection is not None:
+			self.__connection.commit()
+
+		return change
+
+	def table(self):
+		"""
+		:return: A list of (name, rating, games) tuples of all rated bots, from the highest rating to the lowest
+		"""
+		return sorted(((name, rating, games) for name, (rating, games) in self.__ratings.items()), key=lambda entry: -entry[1])
+
+	def close(self):
+		if self.__connection is not None:
+			self.__connection.close()
@@ -0,0 +1,93 @@
+"""
+A store for the results of finished games, kept in a local SQLite database.
+
+Every game is recorded as soon as it is finished, so the results of a long
+tournament survive an interruption, and the games that were already played
+can be skipped when it is resumed.
+"""
+
+import sqlite3, time
+
+
+class ResultStore:
+	"""
+	The results of finished games. A game is identified by the bots in each seat, its seed, its
+	starting phase and whether it is a single round or a full match. All bots are referred to by
+	their names.
+	"""
+
+	__SCHEMA = """
+		CREATE TABLE IF NOT EXISTS games (
+			id INTEGER PRIMARY KEY,
+			tournament_seed INTEGER,
+			player1 TEXT NOT NULL,
+			player2 TEXT NOT NULL,
+			seed INTEGER NOT NULL,
+			phase INTEGER NOT NULL,
+			match_points INTEGER NOT NULL DEFAULT 0,
+			winner INTEGER,
+			points INTEGER,
+			moves INTEGER,
+			rounds INTEGER,
+			player1_time REAL,
+			player2_time REAL,
+			played_at REAL,
+			UNIQUE (player1, player2, seed, phase, match_points)
+		)
+	"""
+
+	def __init__(self, path):
+		"""
+		:param path: The path of the database file. It is created if it does not exist yet.
+		"""
+		self.__connection = sqlite3.connect(path)
+		self.__connection.execute(self.__SCHEMA)
+		self.__connection.commit()
+
+	def add(self, player1, player2, seed, phase, winner, points, moves, player1_time, player2_time, tournament_seed=None, match_points=0, rounds=1):
+		"""
+		Records a finished game, and commits it to the database right away.
+
+		:param player1: The name of the bot playing as player 1
+		:param player2: The name of the bot playing as player 2
+		:param seed: The seed the game was generated with
+		:param phase: The phase the game started at
+		:param winner: The player id (1 or 2) of the winner, or None
+		:param points: The game points the winner received
+		:param moves: The number of moves made in the game, by both players together
+		:param player1_time: The total time in seconds player 1 took to make its moves
+		:param player2_time: The total time in seconds player 2 took to make its moves
+		:param tournament_seed: The seed of the tournament the game is part of, if any
+		:param match_points: For a full match (see engine.play_match), the game points needed to win it. 0 for a single round.
+		:param rounds: The number of rounds played
+		"""
+		self.__connection.execute(
+			"INSERT OR REPLACE INTO games (tournament_seed, player1, player2, seed, phase, match_points, winner, points, moves, rounds, player1_time, player2_time, played_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+			(tournament_seed, player1, player2, seed, phase, match_points, winner, points, moves, rounds, player1_time, player2_time, time.time()))
+		self.__connection.commit()
+
+	def get(self, player1, player2, seed, phase, match_points=0):
+		"""
+		:return: The winner (1, 2 or None), the game points and the number of rounds of the recorded game, or None if the game was not recorded
+		"""
+		return self.__connection.execute(
+			"SELECT winner, points, rounds FROM games WHERE player1 = ? AND player2 = ? AND seed = ? AND phase = ? AND match_points = ?",
+			(player1, player2, seed, phase, match_points)).fetchone()
+
+	def games(self):
+		"""
+		:return: A list of all recorded games as dictionaries with the columns as keys, in the order they were recorded
+		"""
+		cursor = self.__connection.execute("SELECT * FROM games ORDER BY id")
+		columns = [description[0] for description in cursor.description]
+		return [dict(zip(columns, row)) for row in cursor]
+
+	def last_tournament_seed(self):
+		"""
+		:return: The tournament seed of the most recently recorded game, or None
+		"""
+		row = self.__connection.execute("SELECT tournament_seed FROM games WHERE tournament_seed IS NOT NULL ORDER BY id DESC LIMIT 1").fetchone()
+		return None if row is None else row[0]
+
+	def close(self):
+		self.__connection.close()
@@ -0,0 +1,83 @@
+"""
+Statistics for comparing bots from the results of their games.
+"""
+
+import math, statistics
+
+
+def expected_score(elo):
+	"""
+	:param elo: A difference in Elo rating
+	:return: The expected score (win probability) of the stronger side of that difference
+	"""
+	return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+
+def elo_difference(score):
+	"""
+	:param score: A win rate between 0 and 1
+	:return: The difference in Elo rating that corresponds to it. Inverse of expected_score. A
+		win rate of 0 or 1 gives an infinite difference.
+	"""
+	if score <= 0.0:
+		return -math.inf
+	if score >= 1.0:
+		return math.inf
+	return -400.0 * math.log10(1.0 / score - 1.0)
+
+
+def sprt_llr(wins, losses, elo0, elo1):
+	"""
+	The log-likelihood ratio of a sequential probability ratio test of the hypothesis H1 that a bot is
+	elo1 rating points stronger than its opponent, against H0 that it is elo0 points stronger.
+	Schnapsen has no draws, so every game is a win or a loss.
+
+	:param wins: The number of games the bot won
+	:param losses: The number of games the bot lost
+	:return: A float: positive values favour H1, negative values H0
+	"""
+	p0 = expected_score(elo0)
+	p1 = expected_score(elo1)
+	return wins * math.log(p1 / p0) + losses * math.log((1.0 - p1) / (1.0 - p0))
+
+
+def sprt_bounds(alpha, beta):
+	"""
+	:param alpha: The probability of accepting H1 when H0 is true
+	:param beta: The probability of accepting H0 when H1 is true
+	:return: The lower and the upper bound for the log-likelihood ratio of the test
+	"""
+	return math.log(beta / (1.0 - alpha)), math.log((1.0 - beta) / alpha)
+
+
+def sprt(wins, losses, elo0=-20.0, elo1=20.0, alpha=0.05, beta=0.05):
+	"""
+	Decides a sequential probability ratio test (see sprt_llr) on the results so far.
+
+	:return: 1 if H1 is accepted, -1 if H0 is accepted and 0 if more games are needed
+	"""
+	llr = sprt_llr(wins, losses, elo0, elo1)
+	lower, upper = sprt_bounds(alpha, beta)
+
+	if llr >= upper:
+		return 1
+	if llr <= lower:
+		return -1
+	return 0
+
+
+def mean_interval(values, confidence=0.95):
+	"""
+	A confidence interval for the mean of independent samples, using the normal approximation.
+
+	:param values: A sequence of numbers, such as the scores of a bot in a number of games
+	:param confidence: The probability that the interval contains the true mean
+	:return: The mean and the half width of the interval. The half width is infinite for fewer than two values.
+	"""
+	mean = statistics.fmean(values) if len(values) > 0 else math.nan
+	if len(values) < 2:
+		return mean, math.inf
+
+	z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2.0)
+	return mean, z * statistics.stdev(values) / math.sqrt(len(values))
+
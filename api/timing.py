@@ -0,0 +1,85 @@
+"""
+Collects how long bots take to make their moves.
+
+A MoveTimes collector records the time of every move a bot makes, along
+with the phase of the game, the number of cards in the bot's hand and its
+number of legal moves. It summarizes them as percentiles per bot, which
+show how close a bot gets to the time limit.
+"""
+
+import math
+
+
+class MoveTimes:
+	"""
+	The move times of a number of bots, referred to by their names. Every sample is a tuple
+	(seconds, phase, hand size, number of legal moves).
+	"""
+
+	# The percentiles shown in a report. The 100th percentile is the longest time.
+	PERCENTILES = (50, 95, 99, 100)
+
+	def __init__(self):
+		self.samples = {}
+
+	def add(self, name, seconds, phase, hand_size, legal_moves):
+		"""
+		Records the time of one move.
+		"""
+		self.samples.setdefault(name, []).append((seconds, phase, hand_size, legal_moves))
+
+	def recorder(self, player1, player2):
+		"""
+		:param player1: The name of the bot playing as player 1
+		:param player2: The name of the bot playing as player 2
+		:return: A function that records every move of a game, to be given as on_move to engine.play
+		"""
+		names = (None, player1, player2)
+
+		def on_move(player, state, move, seconds):
+			self.add(names[player], seconds, state.get_phase(), len(state.hand()), len(state.moves()))
+
+		return on_move
+
+	def merge(self, other):
+		"""
+		Adds all samples of another collector, such as one filled in a different process.
+		"""
+		for name, samples in other.samples.items():
+			self.samples.setdefault(name, []).extend(samples)
+
+	def percentiles(self, name, percentiles=PERCENTILES, phase=None):
+		"""
+		:param name: The name of a bot
+		:param percentiles: The percentiles to compute, between 0 and 100
+		:param phase: Only use the moves made in this phase. If None, use all moves.
+		:return: A list with the move time in seconds at every given percentile (using the nearest
+			rank), or None if there are no moves
+		"""
+		times = sorted(sample[0] for sample in self.samples.get(name, []) if phase is None or sample[1] == phase)
+		if len(times) == 0:
+			return None
+		return [times[max(int(math.ceil(p / 100.0 * len(times))) - 1, 0)] for p in percentiles]
+
+	def report(self, max_time=None):
+		"""
+		:param max_time: The time limit for a move in seconds. If given, the longest time of every bot
+			is shown as a fraction of it.
+		:return: A table with the move time percentiles of every bot, overall and per phase, as a string
+		"""
+		lines = ['{:<16} {:>5} {:>7} {:>10} {:>10} {:>10} {:>10}{}'.format('bot', 'phase', 'moves', 'p50', 'p95', 'p99', 'max', ' {:>10}'.format('max/limit') if max_time else '')]
+
+		for name in sorted(self.samples):
+			for phase in (None, 1, 2):
+				times = self.percentiles(name, phase=phase)
+				if times is None:
+					continue
+
+				moves = sum(1 for sample in self.samples[name] if phase is None or sample[1] == phase)
+				line = '{:<16} {:>5} {:>7}'.format(name, 'all' if phase is None else phase, moves)
+				line += ''.join(' {:>8.2f}ms'.format(seconds * 1000) for seconds in times)
+				if max_time:
+					line += ' {:>10.0%}'.format(times[-1] / max_time)
+				lines.append(line)
+
+		return '\n'.join(lines)
@@ -2,10 +2,11 @@
 General utility functions
 """
 
-import math, sys, os, inspect
+import math, sys, os, inspect, time
 import traceback
 import importlib
 from api import Deck
+from api._tables import MARRIAGE_CODE, EXCHANGE_CODE
 
 
 def other(
@@ -44,6 +45,142 @@ def get_card_name(card_index):
     """
     return get_rank(card_index), get_suit(card_index)
 
+def encode_move(move):
+    # type: (tuple) -> int
+    """
+    Encodes a move tuple as a single integer, the form returned by State.moves(encoded=True):
+    card i played is i, a marriage (i, j) is 20 + i and a trump jack exchange (None, j) is 40 + j.
+    :param move:
+    :return:
+    """
+    if move[0] is None:
+        return EXCHANGE_CODE + move[1]
+    if move[1] is None:
+        return move[0]
+    return MARRIAGE_CODE + move[0]
+
+def decode_move(code):
+    # type: (int) -> tuple
+    """
+    Returns the move tuple for an integer move code. Inverse of encode_move.
+    :param code:
+    :return:
+    """
+    if code >= EXCHANGE_CODE:
+        return None, code - EXCHANGE_CODE
+    if code >= MARRIAGE_CODE:
+        card = code - MARRIAGE_CODE
+        # The other half of a marriage is the Queen for a King and the King for a Queen
+        return card, card + 1 if card % 5 == 2 else card - 1
+    return code, None
+
+
+def permute_move(move, permutation):
+    # type: (tuple, list) -> tuple
+    """
+    Maps a move to the move with the same ranks in the permuted suits, e.g. to map a move between a
+    state and its canonical state (see State.canonical). Use inverse_permutation to map it back.
+    :param move:
+    :param permutation: A list mapping every suit id to a new suit id
+    :return:
+    """
+    return tuple(None if card is None else permutation[card // 5] * 5 + card % 5 for card in move)
+
+def inverse_permutation(permutation):
+    # type: (list) -> list
+    """
+    Returns the permutation that undoes the given suit permutation.
+    :param permutation:
+    :return:
+    """
+    inverse = [0] * len(permutation)
+    for suit, permuted in enumerate(permutation):
+        inverse[permuted] = suit
+    return inverse
+
+
+# Deadlines are absolute times on the clock of time.monotonic, which is shared by all processes on
+# the same machine, so the engine can compute a deadline and a bot in a child process can check it.
+
+class OutOfTime(Exception):
+    """
+    Can be raised by a search that runs past its deadline, to stop it from deep inside the recursion.
+    """
+    pass
+
+def deadline_in(seconds):
+    # type: (float) -> float
+    """
+    Returns the deadline the given number of seconds from now.
+    :param seconds:
+    :return:
+    """
+    return time.monotonic() + seconds
+
+def time_left(deadline):
+    # type: (float) -> float
+    """
+    Returns the number of seconds until the deadline (negative once it has passed), or infinity if the deadline is None.
+    :param deadline:
+    :return:
+    """
+    if deadline is None:
+        return float('inf')
+    return deadline - time.monotonic()
+
+def expired(deadline):
+    # type: (float) -> bool
+    """
+    Returns whether the deadline has passed. Cheap enough to call at every node of a search. A deadline of None never passes.
+    :param deadline:
+    :return:
+    """
+    return deadline is not None and time.monotonic() >= deadline
+
+def search_deadline(deadline, fraction=0.8):
+    # type: (float, float) -> float
+    """
+    Returns the time a search should stop at to use the given fraction of the time left until
+    the deadline, keeping the rest as a margin to return the move in time. None if the deadline is None.
+    :param deadline:
+    :param fraction:
+    :return:
+    """
+    if deadline is None:
+        return None
+    now = time.monotonic()
+    return now + max(deadline - now, 0.0) * fraction
+
+# Whether the get_move method of each bot class takes a deadline, see accepts_deadline
+_accepts_deadline = {}
+
+def accepts_deadline(player):
+    # type: (object) -> bool
+    """
+    Returns whether the get_move method of a bot takes a deadline argument: get_move(state, deadline=...).
+    :param player:
+    :return:
+    """
+    cls = type(player)
+    if cls not in _accepts_deadline:
+        try:
+            _accepts_deadline[cls] = 'deadline' in inspect.signature(player.get_move).parameters
+        except (TypeError, ValueError):
+            _accepts_deadline[cls] = False
+    return _accepts_deadline[cls]
+
+def call_get_move(player, state, deadline=None):
+    """
+    Asks a bot for a move, passing the deadline if its get_move takes one (see accepts_deadline).
+    :param player:
+    :param state:
+    :param deadline: The absolute time (see deadline_in) by which the move must be returned, or None if there is no limit
+    :return: The move returned by the bot
+    """
+    if deadline is not None and accepts_deadline(player):
+        return player.get_move(state, deadline=deadline)
+    return player.get_move(state)
+
 
 class BotFactory:
     """
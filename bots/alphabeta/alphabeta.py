@@ -7,19 +7,142 @@
 from api import State, util
 import random
 
+# The kinds of values in the transposition table: the exact value of a state, or a bound for it
+# found when the search of the state was cut off by alpha-beta pruning
+EXACT, LOWER, UPPER = range(3)
+
+# The remaining depth stored for the value of a state whose search reached the end of the game
+# everywhere, which is valid for a search of any depth
+COMPLETE = 1000
+
+
+class TranspositionTable:
+    """
+    A table with the results of earlier searches, indexed by the key of the state (see State.key).
+    The same state is often reached by playing the same cards in another order, and its search
+    then does not have to be repeated.
+
+    The table has a fixed number of slots, and every key has one slot. When a slot is taken, a new
+    entry replaces the old one if the old one is from an earlier move, or if the new one comes from
+    a search that is at least as deep.
+    """
+
+    def __init__(self, size=2**16):
+        """
+        :param size: The number of slots, a power of two
+        """
+        self.__mask = size - 1
+        self.__slots = [None] * size
+
+        # Incremented for every move, so the entries of earlier moves can be replaced
+        self.__generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        self.__generation += 1
+
+    def probe(self, key):
+        """
+        :return: The (depth, value, bound, move) stored for the state with the given key, or None
+        """
+        entry = self.__slots[key & self.__mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:5]
+
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, bound, move):
+        """
+        Stores the result of a search of the given depth, if the replacement policy allows it.
+        """
+        index = key & self.__mask
+        entry = self.__slots[index]
+
+        if entry is not None and entry[0] != key and entry[5] == self.__generation and entry[1] > depth:
+            return
+
+        if entry is not None and entry[0] != key:
+            self.replacements += 1
+
+        self.stores += 1
+        self.__slots[index] = (key, depth, value, bound, move, self.__generation)
+
+    def __len__(self):
+        return sum(1 for entry in self.__slots if entry is not None)
+
+    def __repr__(self):
+        return "{} entries, {} hits, {} misses, {} stores, {} replacements".format(len(self), self.hits, self.misses, self.stores, self.replacements)
+
+
 class Bot:
 
     __max_depth = -1
     __randomize = True
 
-    def __init__(self, randomize=True, depth=8):
+    # The time the current search has to stop at, or None
+    __stop = None
+
+    # The number of times the current search reached its depth limit
+    __cut_offs = 0
+
+    def __init__(self, randomize=True, depth=8, table_size=2**16):
+        """
+        :param table_size: The number of slots of the transposition table, a power of two. 0 disables the table.
+        """
         self.__randomize = randomize
         self.__max_depth = depth
+        self.__table = TranspositionTable(table_size) if table_size > 0 else None
+
+    def get_table(self):
+        """
+        :return: The transposition table, with its hit and miss counters, or None if it is disabled
+        """
+        return self.__table
+
+    def get_move(self, state, deadline=None):
+        if self.__table is not None:
+            self.__table.new_search()
+
+        if deadline is None:
+            val, move = self.value(state)
+            return move
+
+        # There is no point in spending time on a forced move
+        moves = state.moves()
+        if len(moves) == 1:
+            return moves[0]
+
+        # With a deadline, deepen the search one ply at a time and return the move of the deepest
+        # search that finished in time. The search of one ply always finishes.
+        self.__stop = util.search_deadline(deadline)
+        max_depth = self.__max_depth
+        best_move = None
 
-    def get_move(self, state):
-        val, move = self.value(state)
+        try:
+            self.__max_depth = 1
+            while True:
+                self.__cut_offs = 0
+                val, best_move = self.value(state.clone())
 
-        return move
+                # Searching deeper is only useful if the search did not already reach the end of the game
+                if self.__cut_offs == 0:
+                    break
+                self.__max_depth += 1
+
+        except util.OutOfTime:
+            pass
+
+        finally:
+            self.__stop = None
+            self.__max_depth = max_depth
+
+        return best_move
 
     def value(self, state, alpha=float('-inf'), beta=float('inf'), depth = 0):
         """
@@ -36,8 +159,31 @@ class Bot:
             return (points, None) if winner == 1 else (-points, None)
 
         if depth == self.__max_depth:
+            self.__cut_offs += 1
             return heuristic(state)
 
+        # Give up a search that runs out of time, unless it is the first one
+        if self.__max_depth > 1 and util.expired(self.__stop):
+            raise util.OutOfTime()
+
+        remaining = self.__max_depth - depth
+        table_move = None
+
+        if self.__table is not None:
+            key = state.key()
+            entry = self.__table.probe(key)
+
+            if entry is not None:
+                table_depth, table_value, bound, table_move = entry
+
+                # A result of a search at least as deep can be used, except at the root, where we
+                # search anyway to be sure to return a legal move
+                if depth > 0 and table_depth >= remaining:
+                    if bound == EXACT or (bound == LOWER and table_value >= beta) or (bound == UPPER and table_value <= alpha):
+                        if table_depth < COMPLETE:
+                            self.__cut_offs += 1
+                        return table_value, table_move
+
         best_value = float('-inf') if maximizing(state) else float('inf')
         best_move = None
 
@@ -46,10 +192,21 @@ class Bot:
         if self.__randomize:
             random.shuffle(moves)
 
+        # The best move of an earlier search is likely to be good, and to cause a cut off early
+        if table_move in moves:
+            moves.remove(table_move)
+            moves.insert(0, table_move)
+
+        original_alpha, original_beta = alpha, beta
+        cut_offs = self.__cut_offs
+
         for move in moves:
 
-            next_state = state.next(move)
-            value, _ = self.value(next_state, depth)
+            # Play the move in place and take it back after the recursive call,
+            # instead of creating a new state for every node of the tree
+            state.apply(move, trusted=True)
+            value, _ = self.value(state, alpha, beta, depth + 1)
+            state.undo()
 
             if maximizing(state):
                 if value > best_value:
@@ -67,6 +224,17 @@ class Bot:
             if beta <= alpha:
                 break
 
+        if self.__table is not None:
+            if best_value <= original_alpha:
+                bound = UPPER
+            elif best_value >= original_beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+
+            # If no part of the search reached the depth limit, its result holds for any depth
+            self.__table.store(key, remaining if self.__cut_offs > cut_offs else COMPLETE, best_value, bound, best_move)
+
         return best_value, best_move
 
 def maximizing(state):
@@ -13,6 +13,12 @@ class Bot:
     __max_depth = -1
     __randomize = True
 
+    # The time the current search has to stop at, or None
+    __stop = None
+
+    # Whether the current search reached its depth limit somewhere
+    __cut_off = False
+
     def __init__(self, randomize=True, depth=6):
         """
         :param randomize: Whether to select randomly from moves of equal value (or to select the first always)
@@ -21,12 +27,43 @@ class Bot:
         self.__randomize = randomize
         self.__max_depth = depth
 
-    def get_move(self, state):
-        # type: (State) -> tuple[int, int]
+    def get_move(self, state, deadline=None):
+        # type: (State, float) -> tuple[int, int]
+
+        if deadline is None:
+            val, move = self.value(state)
+            return move
 
-        val, move = self.value(state)
+        # There is no point in spending time on a forced move
+        moves = state.moves()
+        if len(moves) == 1:
+            return moves[0]
+
+        # With a deadline, deepen the search one ply at a time and return the move of the deepest
+        # search that finished in time. The search of one ply always finishes.
+        self.__stop = util.search_deadline(deadline)
+        max_depth = self.__max_depth
+        best_move = None
 
-        return move
+        try:
+            self.__max_depth = 1
+            while True:
+                self.__cut_off = False
+                val, best_move = self.value(state)
+
+                # Searching deeper is only useful if the search did not already reach the end of the game
+                if not self.__cut_off:
+                    break
+                self.__max_depth += 1
+
+        except util.OutOfTime:
+            pass
+
+        finally:
+            self.__stop = None
+            self.__max_depth = max_depth
+
+        return best_move
 
     def value(self, state, depth = 0):
         # type: (State, int) -> tuple[float, tuple[int, int]]
@@ -42,8 +79,13 @@ class Bot:
             return (points, None) if winner == 1 else (-points, None)
 
         if depth == self.__max_depth:
+            self.__cut_off = True
             return heuristic(state)
 
+        # Give up a search that runs out of time, unless it is the first one
+        if self.__max_depth > 1 and util.expired(self.__stop):
+            raise util.OutOfTime()
+
         moves = state.moves()
 
         if self.__randomize:
@@ -54,7 +96,7 @@ class Bot:
 
         for move in moves:
 
-            next_state = state.next(move)
+            next_state = state.next_trusted(move)
 
             # IMPLEMENT: Add a recursive function call so that 'value' will contain the
             # minimax value of 'next_state'
@@ -32,13 +32,11 @@ class Bot:
         scores = [0.0] * len(moves)
 
         for move in moves:
-            for s in range(self.__num_samples):
+            # If we are in an imperfect information state, make the assumptions in one pass.
+            samples = state.sample_worlds(self.__num_samples) if state.get_phase() == 1 else [state] * self.__num_samples
 
-                # If we are in an imperfect information state, make an assumption.
-
-                sample_state = state.make_assumption() if state.get_phase() == 1 else state
-
-                score = self.evaluate(sample_state.next(move), player)
+            for sample_state in samples:
+                score = self.evaluate(sample_state.next_trusted(move), player)
 
                 if score > best_score:
                     best_score = score
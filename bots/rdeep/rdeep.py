@@ -20,7 +20,10 @@ class Bot:
         self.__num_samples = num_samples
         self.__depth = depth
 
-    def get_move(self, state):
+        # The best score and move found while pondering, for the states we may be asked about next, by key
+        self.__pondered = {}
+
+    def get_move(self, state, deadline=None):
 
         # See if we're player 1 or 2
         player = state.whose_turn()
@@ -32,28 +35,65 @@ class Bot:
         # Shuffling the list of moves ensures that.
         random.shuffle(moves)
 
-        best_score = float("-inf")
-        best_move = None
+        # Continue from what we found while the opponent was thinking, if we pondered on this state
+        best = self.__pondered.get(state.key(), [float("-inf"), None])
+        self.__pondered = {}
+
+        # With a deadline, there is no point in spending time on a forced move
+        if deadline is not None and len(moves) == 1:
+            return moves[0]
+
+        # With a deadline, keep sampling rounds for all moves until most of the time is used
+        stop = util.search_deadline(deadline)
+
+        while True:
+            self.sample(state, player, moves, best)
+
+            if stop is None or util.expired(stop):
+                break
 
-        scores = [0.0] * len(moves)
+        return best[1]  # Return the best scoring move
 
+    def sample(self, state, player, moves, best):
+        """
+        Samples every move once, and keeps the best score and move found so far in best.
+        :param best: A list with the best score and the best move found so far, updated in place
+        """
         for move in moves:
-            for s in range(self.__num_samples):
+            # If we are in an imperfect information state, make the assumptions in one pass.
+            samples = state.sample_worlds(self.__num_samples) if state.get_phase() == 1 else [state] * self.__num_samples
 
-                # If we are in an imperfect information state, make an assumption.
+            for sample_state in samples:
+                score = self.evaluate(sample_state.next_trusted(move), player)
 
-                sample_state = state.make_assumption() if state.get_phase() == 1 else state
+                if score > best[0]:
+                    best[0] = score
+                    best[1] = move
 
-                score = self.evaluate(sample_state.next(move), player)
+    def ponder(self, state, stop):
+        """
+        Called while the opponent thinks about its move. Samples the states we may be in after the
+        opponent's reply, until stop() tells us to stop, so get_move can continue from there.
+        """
+        player = util.other(state.whose_turn())
 
-                if score > best_score:
-                    best_score = score
-                    best_move = move
+        while not stop():
+            # In phase 1 we do not know the opponent's hand, so we guess it
+            world = state.sample_worlds(1)[0] if state.get_phase() == 1 else state
 
-        return best_move  # Return the best scoring move
+            for reply in world.moves():
+                if stop():
+                    return
 
+                after = world.next_trusted(reply)
+                if after.finished() or after.whose_turn() != player:
+                    continue
 
+                # The state as the engine will give it to us
+                given = after.clone(signature=player) if after.get_phase() == 1 else after.clone()
 
+                best = self.__pondered.setdefault(given.key(), [float("-inf"), None])
+                self.sample(given, player, given.moves(), best)
 
     def evaluate(self,
                  state,  # type: State
@@ -79,7 +119,7 @@ class Bot:
                 if st.finished():
                     break
 
-                st = st.next(random.choice(st.moves()))
+                st = st.next_trusted(random.choice(st.moves()))
 
             score += self.heuristic(st, player)
 
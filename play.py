@@ -23,13 +23,26 @@ def call_engine(options):
     # Generate or load the map
     state = State.generate(phase=int(options.phase), startingPlayer=1)
 
-    if not options.quiet:
+    if not options.quiet and not options.match:
         # print('-- Using map with id {} '.format(id))
         print('   Start state: ' + str(state))
 
     # Play the game
 
-    engine.play(player1, player2, state=state, max_time=options.max_time*1000, verbose=(not options.quiet), fast=options.fast)
+    # Keep each bot in one process for the whole game
+    workers = None
+    if options.persistent and not options.fast:
+        workers = (engine.BotWorker(player1), engine.BotWorker(player2))
+
+    try:
+        if options.match:
+            engine.play_match(player1, player2, phase=int(options.phase), max_time=options.max_time*1000, verbose=(not options.quiet), fast=options.fast, workers=workers, ponder=options.ponder, deadlines=options.deadlines)
+        else:
+            engine.play(player1, player2, state=state, max_time=options.max_time*1000, verbose=(not options.quiet), fast=options.fast, workers=workers, ponder=options.ponder, deadlines=options.deadlines)
+    finally:
+        if workers is not None:
+            for worker in workers:
+                worker.close()
 
 if __name__ == "__main__":
 
@@ -63,6 +76,26 @@ if __name__ == "__main__":
                         help="This option forgoes the engine's check of whether a bot is able to make a decision in the allotted time, so only use this option if you are sure that your bot is stable.")
 
 
+    parser.add_argument("--persistent",
+                        dest="persistent",
+                        action="store_true",
+                        help="Keep each bot in one process for the whole game instead of starting a new process for every move. The time limit is still enforced.")
+
+    parser.add_argument("--ponder",
+                        dest="ponder",
+                        action="store_true",
+                        help="Let bots that have a ponder method think while they wait for the opponent's move. Requires --persistent.")
+
+    parser.add_argument("--deadlines",
+                        dest="deadlines",
+                        action="store_true",
+                        help="Tell bots that accept a deadline how much time they have left for every move, so they can search until it runs out. Their moves then depend on the speed of the machine. Has no effect with --fast.")
+
+    parser.add_argument("--match",
+                        dest="match",
+                        action="store_true",
+                        help="Play a full match: rounds are played until one bot has 7 game points, and the starting player alternates.")
+
     parser.add_argument("-q", "--quiet", dest="quiet",
                         help="Whether to hide the printed output.",
                         action="store_true")
@@ -71,4 +104,7 @@ if __name__ == "__main__":
 
     options = parser.parse_args()
 
+    if options.ponder and not options.persistent:
+        parser.error("--ponder requires --persistent")
+
     call_engine(options)
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from api import State, util
+from bots.alphabeta.alphabeta import Bot, TranspositionTable, EXACT, LOWER, UPPER
+
+
+class TestAlphabetaTable(TestCase):
+
+	def test_table(self):
+		table = TranspositionTable(4)
+		self.assertIsNone(table.probe(5))
+		table.store(5, 3, 0.5, EXACT, (1, None))
+		self.assertEqual(table.probe(5), (3, 0.5, EXACT, (1, None)))
+		self.assertEqual((table.hits, table.misses), (1, 1))
+
+		# Key 9 has the same slot as key 5. A shallower search of the same move does not replace it.
+		table.store(9, 2, 0.1, LOWER, (2, None))
+		self.assertIsNone(table.probe(9))
+		table.store(9, 3, 0.1, LOWER, (2, None))
+		self.assertEqual(table.probe(9), (3, 0.1, LOWER, (2, None)))
+		self.assertIsNone(table.probe(5))
+		self.assertEqual(table.replacements, 1)
+
+		# The entries of earlier moves are always replaced
+		table.new_search()
+		table.store(5, 1, -0.5, UPPER, None)
+		self.assertEqual(table.probe(5), (1, -0.5, UPPER, None))
+		self.assertEqual(len(table), 1)
+
+	def test_same_values(self):
+		# The table changes how much is searched, not the outcome
+		for depth in (3, 5, 20):
+			bot = Bot(randomize=False, depth=depth)
+			plain = Bot(randomize=False, depth=depth, table_size=0)
+			for seed in range(15):
+				state = State.generate(seed, phase=2)
+				value = plain.value(state.clone())[0]
+				self.assertEqual(bot.value(state.clone())[0], value)
+				# Searched again, the positions are found in the table
+				self.assertEqual(bot.value(state.clone())[0], value)
+
+			self.assertGreater(bot.get_table().hits, 0)
+			self.assertIsNone(plain.get_table())
+
+	def test_get_move(self):
+		bot = Bot()
+		for seed in range(10):
+			state = State.generate(seed, phase=2)
+			while not state.finished():
+				move = bot.get_move(state.clone(), deadline=util.deadline_in(1) if seed % 2 == 0 else None)
+				self.assertIn(move, state.moves())
+				state = state.next(move)
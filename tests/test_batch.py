@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from api import State, util
+from api.batch import BatchState, MOVES
+import numpy as np
+import random
+
+
+class TestBatch(TestCase):
+
+	def assertSameGames(self, batch, states):
+		expected = BatchState.from_states(states)
+		for name in ("locations", "stock", "stock_size", "trick", "previous_trick", "trump", "points", "pending_points", "phase", "leads_turn", "player1s_turn", "revoked"):
+			np.testing.assert_array_equal(getattr(batch, name), getattr(expected, name), err_msg=name)
+
+	def test_matches_state(self):
+		# Play the same moves in the batch and with State.next, including some illegal ones
+		rng = random.Random(0)
+		states = [State.generate(seed, phase=2 if seed % 3 == 0 else 1) for seed in range(200)]
+		batch = BatchState.from_states(states)
+
+		while not all(state.finished() for state in states):
+			mask = batch.legal_move_mask()
+			moves = []
+			for i, state in enumerate(states):
+				if state.finished():
+					self.assertFalse(mask[i].any())
+					moves.append(-1)
+					continue
+
+				legal = state.moves(encoded=True)
+				self.assertEqual(list(np.flatnonzero(mask[i])), sorted(legal))
+
+				move = rng.choice(legal) if rng.random() > 0.01 else rng.randrange(MOVES)
+				moves.append(move)
+				states[i] = state.next(util.decode_move(move))
+
+			batch.step(moves)
+			self.assertSameGames(batch, states)
+
+		winner, points = batch.winner()
+		self.assertEqual([(w, p) for w, p in zip(winner, points)], [state.winner() for state in states])
+
+	def test_random_step(self):
+		batch = BatchState.from_states([State.generate(seed) for seed in range(100)])
+		rng = np.random.default_rng(1)
+		while not batch.finished().all():
+			mask = batch.legal_move_mask()
+			moves = batch.random_step(rng)
+			for i, move in enumerate(moves):
+				self.assertTrue(mask[i, move] if move >= 0 else not mask[i].any())
+
+		self.assertTrue((batch.revoked == 0).all())
+		self.assertTrue(set(batch.winner()[0]) <= {1, 2})
+
+	def test_signed_states(self):
+		state = State.generate(1)
+		self.assertRaises(ValueError, BatchState.from_states, [state.clone(1)])
@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+from api import State, engine, util
+from bots.alphabeta.alphabeta import Bot as AlphabetaBot
+import time
+
+
+class DeadlineBot:
+	# Plays legally only when it is given a deadline in the near future
+	def get_move(self, state, deadline=None):
+		if deadline is None or not 0 < util.time_left(deadline) <= 5:
+			return None
+		return state.moves()[0]
+
+
+class PlainBot:
+	def get_move(self, state):
+		return state.moves()[0]
+
+
+class TestDeadline(TestCase):
+
+	def test_helpers(self):
+		deadline = util.deadline_in(10)
+		self.assertAlmostEqual(util.time_left(deadline), 10, places=1)
+		self.assertFalse(util.expired(deadline))
+		self.assertTrue(util.expired(util.deadline_in(-1)))
+		self.assertFalse(util.expired(None))
+		self.assertEqual(util.time_left(None), float('inf'))
+
+		self.assertIsNone(util.search_deadline(None))
+		self.assertAlmostEqual(util.search_deadline(deadline, 0.5) - time.monotonic(), 5, places=1)
+		self.assertLessEqual(util.search_deadline(util.deadline_in(-1)), time.monotonic())
+
+	def test_detect(self):
+		self.assertTrue(util.accepts_deadline(DeadlineBot()))
+		self.assertFalse(util.accepts_deadline(PlainBot()))
+		for name in ("rdeep", "alphabeta", "minimax"):
+			self.assertTrue(util.accepts_deadline(util.load_player(name)))
+		self.assertFalse(util.accepts_deadline(util.load_player("rand")))
+
+		state = State.generate(2)
+		self.assertEqual(util.call_get_move(PlainBot(), state, util.deadline_in(1)), state.moves()[0])
+		self.assertIsNone(util.call_get_move(DeadlineBot(), state))
+
+	def test_engine(self):
+		# The bot only gets a deadline when deadlines are asked for and the time limit is enforced
+		rand = util.load_player("rand")
+		self.assertEqual(engine.play(DeadlineBot(), rand, State.generate(6, startingPlayer=1), verbose=False, fast=True, deadlines=True), (2, 3))
+		self.assertEqual(engine.play(DeadlineBot(), rand, State.generate(6, startingPlayer=1), 2000, verbose=False), (2, 3))
+
+		moves = []
+		engine.play(DeadlineBot(), rand, State.generate(6, startingPlayer=1), 2000, verbose=False, deadlines=True, on_move=lambda player, state, move, seconds: moves.append(move))
+		self.assertNotIn(None, moves)
+
+		workers = (engine.BotWorker(DeadlineBot()), engine.BotWorker(rand))
+		try:
+			moves = []
+			engine.play(DeadlineBot(), rand, State.generate(6, startingPlayer=1), 2000, verbose=False, workers=workers, deadlines=True, on_move=lambda player, state, move, seconds: moves.append(move))
+			self.assertNotIn(None, moves)
+		finally:
+			for worker in workers:
+				worker.close()
+
+	def test_search_bots(self):
+		# The recursion of minimax is left for students to write, so it can only be asked for forced moves
+		state = State.generate(8, phase=2)
+		for name in ("rdeep", "alphabeta"):
+			bot = util.load_player(name)
+
+			# Even without any time left, the bots return a legal move
+			self.assertIn(bot.get_move(state, deadline=util.deadline_in(-1)), state.moves())
+
+			# The search stops at its deadline. The bound is generous, so a loaded machine does not
+			# fail the test, but a search that ignores the deadline would keep going far beyond it.
+			start = time.monotonic()
+			self.assertIn(bot.get_move(state, deadline=util.deadline_in(0.5)), state.moves())
+			self.assertLess(time.monotonic() - start, 10)
+
+		# A forced move is returned right away
+		state = State.generate(8, phase=2)
+		while len(state.moves()) > 1:
+			state = state.next(state.moves()[0])
+		for name in ("rdeep", "alphabeta", "minimax"):
+			start = time.monotonic()
+			self.assertEqual(util.load_player(name).get_move(state, deadline=util.deadline_in(120)), state.moves()[0])
+			# Searching would take most of the two minutes
+			self.assertLess(time.monotonic() - start, 30)
+
+		# Deepening until the search reaches the end of the game finds a move as good as the full search
+		alphabeta = AlphabetaBot(randomize=False, depth=20)
+		for seed in range(3):
+			state = State.generate(seed, phase=2)
+			move = alphabeta.get_move(state.clone(), deadline=util.deadline_in(60))
+			self.assertEqual(alphabeta.value(state.next(move))[0], alphabeta.value(state.clone())[0])
@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from api import State
+from api._tables import LOCATIONS, cards
+import random
+
+
+class TestDeckHands(TestCase):
+
+	def test_hand_masks(self):
+		# The masks kept up to date during play should agree with a scan of the perspectives
+		for seed in range(50):
+			rng = random.Random(seed)
+			state = State.generate(seed)
+			while not state.finished():
+				player = state.whose_turn()
+				opponent = 3 - player
+				for s in (state, state.clone(player)):
+					perspective = s.get_perspective(player)
+					self.assertEqual(cards(s.known_opponent_hand_mask()), [i for i, x in enumerate(perspective) if x == "P{}H".format(opponent)])
+					self.assertEqual(cards(s.hand_mask()), s.hand())
+
+					codes = s._State__deck.get_location_codes(player)
+					self.assertEqual([LOCATIONS[code] for code in codes], perspective)
+
+				self.assertEqual(cards(state.hand_mask()), [i for i, x in enumerate(state.get_perspective()) if x == "P{}H".format(player)])
+
+				state = state.next(rng.choice(state.moves()))
+
+	def test_location_codes_read_only(self):
+		state = State.generate(2)
+		deck = state._State__deck
+		codes = deck.get_location_codes()
+		self.assertRaises(TypeError, codes.__setitem__, 0, 0)
+
+		# The view follows the deck without being requested again
+		move = state.moves()[0]
+		state.apply(move)
+		self.assertEqual([LOCATIONS[code] for code in codes], state.get_perspective())
@@ -0,0 +1,53 @@
+from unittest import TestCase
+
+from api import Deck, State
+from api._tables import cards, from_view, to_view
+import random
+
+
+class TestDeckMasks(TestCase):
+
+	def test_view_round_trip(self):
+		view = ['P1H', 'P1H', 'S', 'S', 'P2H', 'P2H', 'S', 'P2H', 'P1H', 'P2H', 'S', 'P2H', 'S', 'S', 'P1H', 'S', 'P1H', 'P1W', 'P2W', 'U']
+		masks, codes = from_view(view)
+		self.assertEqual(to_view(codes), view)
+		self.assertEqual(cards(masks[0]), [0, 1, 8, 14, 16])
+		self.assertEqual(cards(masks[5]), [19])
+
+	def test_generate(self):
+		d = Deck.generate(0)
+		self.assertEqual(d.get_card_states().count("S"), 10)
+		self.assertEqual(d.get_card_states().count("P1H"), 5)
+		self.assertEqual(d.get_card_states().count("P2H"), 5)
+
+	def test_hands_match_views(self):
+		# The mask based accessors should agree with a scan of the string views
+		for seed in range(50):
+			rng = random.Random(seed)
+			state = State.generate(seed)
+			while not state.finished():
+				for signature in (None, state.whose_turn()):
+					s = state.clone(signature)
+					deck = s._State__deck
+					perspective = deck.get_perspective()
+					for player in (1, 2):
+						term = "P{}H".format(player)
+						hand = [i for i, x in enumerate(perspective) if x == term]
+						self.assertEqual(deck.get_player_hand(player), hand)
+
+						mariages = [(k, q) for k in (2, 7, 12, 17) for q in (k + 1,) if k in hand and q in hand]
+						expected = []
+						for k, q in mariages:
+							expected += [(k, q), (q, k)]
+						self.assertEqual(deck.get_possible_mariages(player), expected)
+
+						exchange = deck.get_stock_size() > 0 and perspective[deck.get_trump_jack_index()] == term
+						self.assertEqual(deck.can_exchange(player), exchange)
+
+				state = state.next(rng.choice(state.moves()))
+
+	def test_json_round_trip(self):
+		state = State.generate(5)
+		state = state.next(state.moves()[0])
+		deck = state._State__deck
+		self.assertEqual(Deck.load_from_json(deck.convert_to_json()), deck)
@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from api import engine, util
+import random
+
+
+class TestEngineMatch(TestCase):
+
+	def test_match(self):
+		bots = [util.load_player("rand"), util.load_player("bully")]
+
+		for seed in range(10):
+			# The player to move at the start of every round, and the stock size of the last state seen in that round.
+			# A round starts when a bot gets a fresh deal after states with a smaller stock.
+			starts = []
+
+			def on_move(player, state, move, seconds):
+				if state.get_stock_size() == 10 and state.get_points(1) == 0 and state.get_points(2) == 0 and (len(starts) == 0 or starts[-1][1] != 10):
+					starts.append((player, 10))
+				elif state.get_stock_size() != 10 and len(starts) > 0:
+					starts[-1] = (starts[-1][0], state.get_stock_size())
+
+			random.seed(seed)
+			winner, points, rounds = engine.play_match(bots[0], bots[1], seed, verbose=False, fast=True, on_move=on_move)
+
+			self.assertEqual(points[winner - 1], max(points))
+			self.assertGreaterEqual(points[winner - 1], 7)
+			self.assertLess(points[2 - winner], 7)
+			# The last round gives at most 3 points
+			self.assertLessEqual(points[winner - 1], 9)
+			self.assertGreaterEqual(rounds, 3)
+			self.assertLessEqual(rounds, 13)
+
+			self.assertEqual(len(starts), rounds)
+			for previous, current in zip(starts, starts[1:]):
+				self.assertNotEqual(previous[0], current[0])
+
+			random.seed(seed)
+			self.assertEqual(engine.play_match(bots[0], bots[1], seed, verbose=False, fast=True), (winner, points, rounds))
+
+	def test_points(self):
+		bots = [util.load_player("rand"), util.load_player("rand")]
+		winner, points, rounds = engine.play_match(bots[0], bots[1], 5, points=1, verbose=False, fast=True)
+		self.assertEqual(rounds, 1)
+		self.assertEqual(points[2 - winner], 0)
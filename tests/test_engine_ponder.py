@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from api import State, engine, util
+from multiprocessing import RawValue
+import time
+
+
+class PonderBot:
+	# Ponders until it is stopped, and only plays legal moves once it has pondered
+	def __init__(self):
+		self.moves = 0
+		self.ponders = 0
+
+	def get_move(self, state):
+		self.moves += 1
+		if self.moves > 1 and self.ponders == 0:
+			return None
+		return state.moves()[0]
+
+	def ponder(self, state, stop):
+		while not stop():
+			time.sleep(0.001)
+		self.ponders += 1
+
+
+class BusyBot:
+	# Marks in shared memory whether it is pondering, so the test can see it from outside the worker
+	def __init__(self):
+		self.pondering = RawValue('i', 0)
+
+	def get_move(self, state):
+		return state.moves()[0]
+
+	def ponder(self, state, stop):
+		self.pondering.value = 1
+		while not stop():
+			time.sleep(0.001)
+		self.pondering.value = 0
+
+
+class TestEnginePonder(TestCase):
+
+	def test_ponder(self):
+		rand = util.load_player("rand")
+
+		for ponder in (True, False):
+			workers = (engine.BotWorker(rand), engine.BotWorker(PonderBot()))
+			try:
+				moves = []
+				engine.play(rand, PonderBot(), State.generate(3, startingPlayer=1), 2000, verbose=False, workers=workers, ponder=ponder, on_move=lambda player, state, move, seconds: moves.append((player, move)))
+			finally:
+				for worker in workers:
+					worker.close()
+
+			# Pondering is stopped when the bot is asked for its move, so it never runs late. Without
+			# pondering, the bot gives up after its first move.
+			answers = [move for player, move in moves if player == 2]
+			self.assertGreater(len(answers), 1)
+			self.assertEqual(all(isinstance(move, tuple) for move in answers), ponder)
+
+	def test_stop_at_end(self):
+		# The last ponder of a game is stopped when the game ends, not when the next request comes
+		rand = util.load_player("rand")
+		bot = BusyBot()
+		workers = (engine.BotWorker(bot), engine.BotWorker(rand))
+		try:
+			# In some of these games, the bot is pondering when its opponent makes the last move
+			for seed in range(6):
+				engine.play(bot, rand, State.generate(seed), 2000, verbose=False, workers=workers, ponder=True)
+
+				end = time.monotonic() + 5
+				while bot.pondering.value and time.monotonic() < end:
+					time.sleep(0.01)
+				self.assertEqual(bot.pondering.value, 0)
+		finally:
+			for worker in workers:
+				worker.close()
+
+	def test_rdeep(self):
+		# What rdeep finds while pondering is used for the next move
+		rdeep = util.load_player("rdeep")
+		state = State.generate(5, startingPlayer=1)
+		state = state.next(state.moves()[0])
+		state = state.next(state.moves()[0])
+
+		calls = [0]
+		def stop():
+			calls[0] += 1
+			return calls[0] > 500
+
+		waiting = util.other(state.whose_turn())
+		rdeep.ponder(state.clone(signature=waiting), stop)
+		pondered = rdeep._Bot__pondered
+		self.assertGreater(len(pondered), 0)
+		self.assertTrue(all(move is not None for score, move in pondered.values()))
+
+		reply = state.next(state.moves()[0])
+		given = reply.clone(signature=waiting)
+		self.assertIn(given.key(), pondered)
+
+		self.assertIn(rdeep.get_move(given), given.moves())
+		self.assertEqual(rdeep._Bot__pondered, {})
@@ -0,0 +1,121 @@
+from unittest import TestCase
+
+from api import State, engine, util
+from multiprocessing import Pipe
+import random, time
+
+
+class SlowBot:
+	# Takes too long whenever the previous card of the trick is an Ace
+	def get_move(self, state):
+		if state.get_opponents_played_card() is not None and state.get_opponents_played_card() % 5 == 0:
+			time.sleep(5)
+		return state.moves()[0]
+
+
+class FailingBot:
+	def get_move(self, state):
+		raise ValueError()
+
+
+class OddBot:
+	# Returns something that is not a move
+	def get_move(self, state):
+		return [state.moves()[0][0], None]
+
+
+class BoolBot:
+	# Returns a move with a bool for a card, which equals the int 1 but is not a legal move
+	def get_move(self, state):
+		return (True, None)
+
+
+class TestEngineWorkers(TestCase):
+
+	def test_same_games(self):
+		# The moves and the random number generator state reach the bots as they do with a process per move
+		bots = [util.load_player("rand"), util.load_player("bully")]
+		workers = (engine.BotWorker(bots[0]), engine.BotWorker(bots[1]))
+		try:
+			results = []
+			for use_workers in (False, True):
+				random.seed(3)
+				results.append([engine.play(bots[0], bots[1], State.generate(seed), verbose=False, workers=workers if use_workers else None) for seed in range(4)])
+			self.assertEqual(results[0], results[1])
+		finally:
+			for worker in workers:
+				worker.close()
+
+	def test_timeout_respawn(self):
+		worker = engine.BotWorker(SlowBot())
+		try:
+			# A state in which an Ace was led, and one in which another card was led
+			state = [State.generate(seed) for seed in range(20) if any(card % 5 == 0 for card in State.generate(seed).hand())][0]
+			slow = state.next([move for move in state.moves() if move[0] is not None and move[0] % 5 == 0][0])
+			fast = state.next([move for move in state.moves() if move[0] is not None and move[0] % 5 != 0][0])
+
+			self.assertEqual(worker.get_move(slow, 200, False), "Late")
+
+			# The worker is respawned and answers the next request
+			self.assertEqual(worker.get_move(fast, 2000, False), fast.moves()[0])
+		finally:
+			worker.close()
+
+	def test_send_move(self):
+		receiver, sender = Pipe(duplex=False)
+		for move in [(0, None), (19, None), (2, 3), (18, 17), (None, 4), (None, 19), None, "Late", [3, None], (25, None), (-1, None), ("a", "b"), (True, None), (2, False), (1.0, None), (None, None), (1, 2, 3)]:
+			engine.send_move(sender, move)
+			received = engine.receive_move(receiver)
+			self.assertEqual(received, move)
+			self.assertEqual(type(received), type(move))
+			if type(move) is tuple:
+				self.assertEqual([type(card) for card in received], [type(card) for card in move])
+		receiver.close()
+		sender.close()
+
+	def test_process_per_move(self):
+		state = State.generate(7)
+		given = state.clone(signature=state.whose_turn())
+		random.seed(1)
+		move = engine.get_move(given, util.load_player("rand"), 2000, False)
+		self.assertIn(move, state.moves())
+
+		# Whatever a bot returns reaches the engine as it is
+		self.assertEqual(engine.get_move(given, OddBot(), 2000, False), [given.moves()[0][0], None])
+		self.assertEqual(engine.get_move(given, SlowBot(), 2000, False), given.moves()[0])
+		self.assertIsNone(engine.get_move(given, FailingBot(), 2000, False))
+
+	def test_malformed_move(self):
+		# A malformed move revokes the game whether the bot runs in a worker or in a process per move.
+		# Player 1 has card 1 in this deal, so (1, None) would be a legal move.
+		rand = util.load_player("rand")
+		workers = (engine.BotWorker(BoolBot()), engine.BotWorker(rand))
+		try:
+			for game_workers in (None, workers):
+				moves = []
+				self.assertEqual(engine.play(BoolBot(), rand, State.generate(4, startingPlayer=1), 2000, verbose=False, workers=game_workers, on_move=lambda player, state, move, seconds: moves.append(move)), (2, 3))
+				self.assertEqual(moves, [(True, None)])
+				self.assertIs(moves[0][0], True)
+		finally:
+			for worker in workers:
+				worker.close()
+
+	def test_fork_server(self):
+		server = engine.ForkServer(["rand", "rdeep"])
+		try:
+			# The moves and the random number generator state reach the bots as they do with a process per move
+			rand = util.load_player("rand")
+			for use_server in (False, True):
+				random.seed(5)
+				states = [State.generate(seed) for seed in range(6)]
+				moves = [server.seat(0).get_move(state, 2000, False) if use_server else engine.get_move(state, rand, 2000, False) for state in states]
+				if use_server:
+					self.assertEqual(moves, expected)
+				expected = moves
+
+			# A bot that takes too long is killed, and the server is restarted for the next move
+			state = State.generate(3, phase=2)
+			self.assertEqual(server.get_move(1, state, 1, False), "Late")
+			self.assertIn(server.get_move(1, state, 2000, False), state.moves())
+		finally:
+			server.close()
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from api.rating import Ratings
+import os, tempfile
+
+
+class TestRating(TestCase):
+
+	def test_update(self):
+		ratings = Ratings(k=20.0)
+		self.assertEqual(ratings.rating("a"), 1500.0)
+
+		# Between equal ratings, the winner gains half of k
+		self.assertAlmostEqual(ratings.update("a", "b", 1.0), 10.0)
+		self.assertAlmostEqual(ratings.rating("a"), 1510.0)
+		self.assertAlmostEqual(ratings.rating("b"), 1490.0)
+
+		# An expected win gains less than an upset
+		self.assertLess(ratings.update("a", "b", 1.0), 10.0)
+		self.assertGreater(ratings.update("b", "a", 1.0), 10.0)
+		self.assertAlmostEqual(ratings.rating("a") + ratings.rating("b"), 3000.0)
+		self.assertEqual(ratings.games("a"), 3)
+
+		self.assertEqual([name for name, rating, games in ratings.table()], sorted(["a", "b"], key=lambda name: -ratings.rating(name)))
+
+	def test_fixed(self):
+		ratings = Ratings()
+		ratings.update("new", "anchor", 0.0, fixed=["anchor"])
+		self.assertEqual(ratings.rating("anchor"), 1500.0)
+		self.assertLess(ratings.rating("new"), 1500.0)
+
+	def test_persist(self):
+		path = os.path.join(tempfile.mkdtemp(), "ratings.db")
+		ratings = Ratings(path)
+		ratings.update("a", "b", 1.0)
+		ratings.update("a", "c", 0.5)
+		table = ratings.table()
+		ratings.close()
+
+		ratings = Ratings(path)
+		self.assertEqual(ratings.table(), table)
+		ratings.close()
@@ -0,0 +1,68 @@
+from unittest import TestCase
+
+from api import State
+import random
+
+
+class TestStateApply(TestCase):
+
+	def assertSameState(self, a, b):
+		self.assertEqual(a, b)
+		self.assertEqual(a.get_prev_trick(), b.get_prev_trick())
+		self.assertEqual(a.convert_to_json(), b.convert_to_json())
+		for player in (None, 1, 2):
+			self.assertEqual(a.key(player), b.key(player))
+
+	def test_apply_matches_next(self):
+		# Every legal move, and an illegal one, applied in place should give exactly the state next() gives
+		for seed in range(100):
+			rng = random.Random(seed)
+			state = State.generate(seed, phase=2 if seed % 4 == 0 else 1)
+			while not state.finished():
+				before = state.clone()
+				moves = state.moves() + [(rng.randrange(20), None)]
+
+				for move in moves:
+					expected = state.next(move)
+
+					state.apply(move)
+					if expected.revoked() is None:
+						self.assertSameState(state, expected)
+					else:
+						self.assertEqual(state.revoked(), expected.revoked())
+					state.undo()
+
+					self.assertSameState(state, before)
+
+				state = state.next(rng.choice(state.moves()))
+
+	def test_apply_sequence(self):
+		# Applying a whole game in place and undoing it move by move walks back through the same states
+		state = State.generate(12)
+		played = [state]
+		moves = []
+		while not played[-1].finished():
+			move = random.Random(len(moves)).choice(played[-1].moves())
+			moves.append(move)
+			played.append(played[-1].next(move))
+
+		for move in moves:
+			state.apply(move)
+		self.assertSameState(state, played[-1])
+
+		for previous in reversed(played[:-1]):
+			state.undo()
+			self.assertSameState(state, previous)
+
+		self.assertRaises(RuntimeError, state.undo)
+
+	def test_apply_signed(self):
+		state = State.generate(8)
+		signed = state.clone(state.whose_turn())
+		move = signed.moves()[0]
+		expected = signed.next(move)
+
+		signed.apply(move)
+		self.assertEqual(signed, expected)
+		# The opponent's move can not be applied without making an assumption first
+		self.assertRaises(RuntimeError, signed.apply, (0, None))
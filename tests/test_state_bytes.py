@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from api import State
+import random
+
+
+class TestStateBytes(TestCase):
+
+	def assertSameState(self, a, b):
+		self.assertEqual(a, b)
+		self.assertEqual(a.get_prev_trick(), b.get_prev_trick())
+		self.assertEqual(a.key(), b.key())
+		for player in (1, 2):
+			self.assertEqual(a.get_perspective(player), b.get_perspective(player))
+
+	def test_round_trip(self):
+		for seed in range(50):
+			rng = random.Random(seed)
+			state = State.generate(seed, phase=2 if seed % 4 == 0 else 1)
+			while not state.finished():
+				for s in (state, state.clone(state.whose_turn())):
+					data = s.to_bytes()
+					self.assertEqual(len(data), State.BYTES)
+					self.assertSameState(State.from_bytes(data), s)
+
+				state = state.next(rng.choice(state.moves()))
+
+			self.assertSameState(State.from_bytes(state.to_bytes()), state)
+
+	def test_revoked(self):
+		state = State.generate(6)
+		illegal = [card for card in range(20) if (card, None) not in state.moves()][0]
+		state = state.next((illegal, None))
+		self.assertIsNotNone(state.revoked())
+		self.assertEqual(State.from_bytes(state.to_bytes()).revoked(), state.revoked())
+
+	def test_many(self):
+		states = [State.generate(seed) for seed in range(10)]
+		data = State.to_bytes_many(states)
+		self.assertEqual(len(data), 10 * State.BYTES)
+		self.assertEqual(State.from_bytes_many(data), states)
+		self.assertEqual(State.from_bytes(data, 3 * State.BYTES), states[3])
+		self.assertRaises(ValueError, State.from_bytes_many, data[1:])
@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from api import State, util
+import itertools, random
+
+
+def permuted(state, permutation):
+	# A copy of the state with the suits relabelled
+	state = state.clone()
+	state._State__deck = state._State__deck.permute_suits(permutation)
+	return state
+
+
+def non_trump_permutations(state):
+	trump = "CDHS".index(state.get_trump_suit())
+	others = [suit for suit in range(4) if suit != trump]
+	for order in itertools.permutations(others):
+		permutation = list(range(4))
+		for suit, label in zip(others, order):
+			permutation[suit] = label
+		yield permutation
+
+
+class TestStateCanonical(TestCase):
+
+	def test_permuted_states_share_key(self):
+		for seed in range(60):
+			rng = random.Random(seed)
+			state = State.generate(seed, phase=2 if seed % 3 == 0 else 1)
+			while not state.finished():
+				canonical, permutation = state.canonical()
+				self.assertEqual(canonical.canonical()[0], canonical)
+
+				for other in non_trump_permutations(state):
+					p = permuted(state, other)
+					self.assertEqual(p.canonical()[0], canonical)
+					self.assertEqual(p.canonical_key(), state.canonical_key())
+					for player in (1, 2):
+						self.assertEqual(p.canonical_key(player), state.canonical_key(player))
+
+				state = state.next(rng.choice(state.moves()))
+
+	def test_moves_map_back(self):
+		for seed in range(30):
+			state = State.generate(seed)
+			state = state.next(state.moves()[0])
+			canonical, permutation = state.canonical()
+			inverse = util.inverse_permutation(permutation)
+
+			moves = canonical.moves()
+			self.assertEqual(set(util.permute_move(move, inverse) for move in moves), set(state.moves()))
+
+			for move in state.moves():
+				self.assertEqual(canonical.next(util.permute_move(move, permutation)), permuted(state.next(move), permutation))
+
+	def test_distinct_positions(self):
+		state = State.generate(7)
+		keys = set(state.next(move).canonical_key() for move in state.moves())
+		self.assertGreater(len(keys), 1)
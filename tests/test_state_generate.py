@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from api import State
+import itertools, json, random
+
+
+class TestStateGenerate(TestCase):
+
+	def test_phase2(self):
+		for seed in range(300):
+			state = State.generate(seed, phase=2)
+			self.assertEqual(state.get_phase(), 2)
+			self.assertEqual(state.get_stock_size(), 0)
+			self.assertFalse(state.finished())
+			self.assertEqual(state, State.generate(seed, phase=2))
+
+			card_states = state.get_perspective()
+			self.assertEqual(card_states.count("P1H"), 5)
+			self.assertEqual(card_states.count("P2H"), 5)
+			self.assertEqual(card_states.count("P1W") % 2, 0)
+			self.assertEqual(card_states.count("P2W") % 2, 0)
+
+			# Every player has the points of the cards in their own won pile
+			scores = {"A": 11, "10": 10, "K": 4, "Q": 3, "J": 2}
+			for player in (1, 2):
+				won = sum(scores[state._State__deck.get_rank(i)] for i, x in enumerate(card_states) if x == "P{}W".format(player))
+				self.assertEqual(state.get_points(player), won)
+				self.assertLess(won, 66)
+
+			# Both players know their own hand, the won cards and where the trump card is
+			for player in (1, 2):
+				perspective = state.get_perspective(player)
+				for i, x in enumerate(card_states):
+					if x in ("P{}H".format(player), "P1W", "P2W"):
+						self.assertEqual(perspective[i], x)
+				# Of the opponent's hand, at most the trump card is known
+				self.assertIn(perspective.count("U"), (4, 5))
+
+			self.assertEqual(State.load_from_json(json.loads(state.convert_to_json())).key(), state.key())
+
+			rng = random.Random(seed)
+			while not state.finished():
+				state = state.next(rng.choice(state.moves()))
+			self.assertIsNone(state.revoked())
+
+	def test_generate_many(self):
+		for phase in (1, 2):
+			self.assertEqual(list(State.generate_many(range(20), phase)), [State.generate(seed, phase) for seed in range(20)])
+
+		# The states are generated as they are asked for
+		states = State.generate_many(itertools.count())
+		self.assertEqual(next(states), State.generate(0))
+		self.assertEqual(next(states), State.generate(1))
+		self.assertTrue(all(state.whose_turn() == 2 for state in State.generate_many(range(20), startingPlayer=2)))
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+from api import State
+import json, random
+
+
+def rebuilt(state):
+	# A copy of the state whose deck hashes are computed from scratch
+	return State.load_from_json(json.loads(state.convert_to_json()))
+
+
+class TestStateKey(TestCase):
+
+	def test_incremental_key(self):
+		# The key kept up to date during play should equal the key computed from scratch
+		for seed in range(100):
+			rng = random.Random(seed)
+			state = State.generate(seed, phase=2 if seed % 4 == 0 else 1)
+			while not state.finished():
+				copy = rebuilt(state)
+				self.assertEqual(state.key(), copy.key())
+				for player in (1, 2):
+					self.assertEqual(state.key(player), copy.key(player))
+
+				state = state.next(rng.choice(state.moves()))
+
+	def test_key_distinguishes(self):
+		state = State.generate(3)
+		keys = set(state.next(move).key() for move in state.moves())
+		self.assertEqual(len(keys), len(state.moves()))
+		self.assertNotEqual(State.generate(3).key(), State.generate(4).key())
+
+	def test_transposition(self):
+		# Playing the same tricks in a different order leads to the same state, and the same key
+		state = State.generate(21, phase=2)
+		frontier = [state]
+		for ply in range(4):
+			frontier = [s.next(move) for s in frontier if not s.finished() for move in s.moves()]
+
+		by_key = {}
+		for s in frontier:
+			by_key.setdefault(s.key(), []).append(s)
+
+		self.assertLess(len(by_key), len(frontier))
+		for states in by_key.values():
+			for s in states:
+				self.assertEqual(s, states[0])
+
+	def test_apply_undo_key(self):
+		state = State.generate(9)
+		key = state.key()
+		for move in state.moves():
+			state.apply(move)
+			self.assertEqual(state.key(), state.clone().key())
+			state.undo()
+			self.assertEqual(state.key(), key)
+
+	def test_information_set_key(self):
+		# Different guesses for the unknown cards share the information set key of the signed state
+		state = State.generate(30)
+		state = state.next(state.moves()[0])
+		signed = state.clone(state.whose_turn())
+
+		keys = set()
+		for i in range(20):
+			assumption = signed.make_assumption()
+			self.assertEqual(assumption.key(signed.whose_turn()), signed.key())
+			keys.add(assumption.key())
+
+		self.assertGreater(len(keys), 1)
+		self.assertEqual(signed.key(), state.key(state.whose_turn()))
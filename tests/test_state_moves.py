@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from api import State, util
+import random
+
+
+def reference_moves(state):
+	# The move generation rules written out on the hand list, as the engine did before using masks
+	hand = state.hand()
+	moves = []
+	if state.get_phase() == 1 or state.whose_turn() == state.leader():
+		moves = [(card, None) for card in hand]
+	else:
+		opponent_card = state.get_opponents_played_card()
+		same_suit = [card for card in hand if util.get_suit(card) == util.get_suit(opponent_card)]
+		higher = [card for card in same_suit if card < opponent_card]
+		trumps = [card for card in hand if util.get_suit(card) == state.get_trump_suit()]
+		playable = higher or same_suit or trumps or hand
+		moves = [(card, None) for card in playable]
+
+	if state.whose_turn() == state.leader():
+		deck = state._State__deck
+		if deck.can_exchange(state.whose_turn()):
+			moves.append((None, deck.get_trump_jack_index()))
+		moves += deck.get_possible_mariages(state.whose_turn())
+	return moves
+
+
+class TestStateMoves(TestCase):
+
+	def test_moves_match_rules(self):
+		for seed in range(200):
+			rng = random.Random(seed)
+			state = State.generate(seed, phase=2 if seed % 2 == 0 else 1)
+			while not state.finished():
+				moves = state.moves()
+				self.assertEqual(moves, reference_moves(state))
+				self.assertEqual(state.moves(encoded=True), [util.encode_move(move) for move in moves])
+				state = state.next(rng.choice(moves))
+
+	def test_encode_decode(self):
+		moves = [(i, None) for i in range(20)] + [(None, j) for j in (4, 9, 14, 19)]
+		for king in (2, 7, 12, 17):
+			moves += [(king, king + 1), (king + 1, king)]
+		codes = [util.encode_move(move) for move in moves]
+		self.assertEqual(len(set(codes)), len(codes))
+		for move, code in zip(moves, codes):
+			self.assertEqual(util.decode_move(code), move)
@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+from api import State
+import json, random
+
+
+class TestStateSample(TestCase):
+
+	def test_worlds_are_valid(self):
+		# Every world agrees with what the signed player knows and keeps its hash up to date
+		for seed in range(30):
+			state = State.generate(seed)
+			state = state.next(state.moves()[0])
+			player = state.whose_turn()
+			signed = state.clone(player)
+
+			for world in signed.sample_worlds(10, random.Random(seed)):
+				self.assertEqual(world.get_perspective(player), state.get_perspective(player))
+				self.assertEqual(len(world.hand()), len(state.hand()))
+				self.assertEqual(world.get_stock_size(), state.get_stock_size())
+				self.assertEqual(world.key(player), signed.key())
+				self.assertEqual(world.key(), world.clone().key())
+				self.assertEqual(world.key(), State.load_from_json(json.loads(world.convert_to_json())).key())
+
+				world.next(world.moves()[0])
+
+	def test_make_assumption_matches(self):
+		# A single world from a seeded generator is the guess make_assumption makes with that seed
+		state = State.generate(17)
+		signed = state.clone(state.whose_turn())
+		deck = signed._State__deck
+		for seed in range(10):
+			world = next(signed.iter_worlds(rng=random.Random(seed)))
+			self.assertEqual(world._State__deck, deck.make_assumption(seed))
+
+	def test_generator(self):
+		state = State.generate(2)
+		signed = state.clone(state.whose_turn())
+		self.assertEqual(len(signed.sample_worlds(25)), 25)
+
+		worlds = signed.iter_worlds()
+		self.assertEqual(len([next(worlds) for i in range(100)]), 100)
+		self.assertGreater(len(set(world.key() for world in signed.iter_worlds(50))), 1)
+
+		self.assertRaises(RuntimeError, state.sample_worlds, 1)
@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+from api import State
+import random
+
+
+class TestStateTrusted(TestCase):
+
+	def tearDown(self):
+		State.check_trusted_moves = False
+
+	def test_trusted_matches_next(self):
+		for seed in range(100):
+			rng = random.Random(seed)
+			state = State.generate(seed, phase=2 if seed % 4 == 0 else 1)
+			while not state.finished():
+				for move in state.moves():
+					expected = state.next(move)
+					self.assertEqual(state.next_trusted(move), expected)
+
+					state.apply(move, trusted=True)
+					self.assertEqual(state, expected)
+					state.undo()
+
+				state = state.next_trusted(rng.choice(state.moves()))
+
+	def test_check_trusted_moves(self):
+		# In debug mode, an illegal trusted move raises an error instead of going unnoticed
+		state = State.generate(4)
+		illegal = ([card for card in range(20) if (card, None) not in state.moves()][0], None)
+
+		State.check_trusted_moves = True
+		self.assertRaises(RuntimeError, state.next_trusted, illegal)
+		self.assertRaises(RuntimeError, state.apply, illegal, True)
+		self.assertEqual(state.next_trusted(state.moves()[0]), state.next(state.moves()[0]))
+
+		# The validated path still revokes
+		self.assertEqual(state.next(illegal).revoked(), state.whose_turn())
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from api import stats
+import math
+
+
+class TestStats(TestCase):
+
+	def test_elo(self):
+		self.assertAlmostEqual(stats.expected_score(0), 0.5)
+		self.assertAlmostEqual(stats.expected_score(400), 10.0 / 11.0)
+		self.assertAlmostEqual(stats.expected_score(-100) + stats.expected_score(100), 1.0)
+		for elo in (-300, -20, 0, 5, 150):
+			self.assertAlmostEqual(stats.elo_difference(stats.expected_score(elo)), elo)
+		self.assertEqual(stats.elo_difference(0.0), -math.inf)
+		self.assertEqual(stats.elo_difference(1.0), math.inf)
+
+	def test_sprt_bounds(self):
+		lower, upper = stats.sprt_bounds(0.05, 0.05)
+		self.assertAlmostEqual(lower, math.log(0.05 / 0.95))
+		self.assertAlmostEqual(upper, -lower)
+
+		# Smaller error rates need more evidence
+		self.assertLess(stats.sprt_bounds(0.01, 0.01)[0], lower)
+		self.assertGreater(stats.sprt_bounds(0.01, 0.01)[1], upper)
+
+	def test_sprt_llr(self):
+		self.assertEqual(stats.sprt_llr(0, 0, -20, 20), 0)
+		# With symmetric hypotheses, a win and a loss cancel out
+		self.assertAlmostEqual(stats.sprt_llr(7, 7, -20, 20), 0)
+		self.assertGreater(stats.sprt_llr(8, 7, -20, 20), 0)
+		self.assertLess(stats.sprt_llr(7, 8, -20, 20), 0)
+		self.assertAlmostEqual(stats.sprt_llr(3, 5, -20, 20), -stats.sprt_llr(5, 3, -20, 20))
+
+	def test_sprt(self):
+		self.assertEqual(stats.sprt(10, 10), 0)
+		self.assertEqual(stats.sprt(60, 20), 1)
+		self.assertEqual(stats.sprt(20, 60), -1)
+
+		# The first number of straight wins that accepts H1
+		wins = next(w for w in range(1000) if stats.sprt(w, 0) != 0)
+		self.assertEqual(stats.sprt(wins, 0), 1)
+		self.assertGreater(stats.sprt_llr(wins, 0, -20, 20), stats.sprt_bounds(0.05, 0.05)[1])
+		self.assertLess(stats.sprt_llr(wins - 1, 0, -20, 20), stats.sprt_bounds(0.05, 0.05)[1])
+
+	def test_mean_interval(self):
+		mean, half_width = stats.mean_interval([1, 0, 1, 1])
+		self.assertAlmostEqual(mean, 0.75)
+		self.assertAlmostEqual(half_width, 1.959964 * 0.5 / 2, places=5)
+
+		# More confidence gives a wider interval, more samples a narrower one
+		self.assertGreater(stats.mean_interval([1, 0, 1, 1], 0.99)[1], half_width)
+		self.assertLess(stats.mean_interval([1, 0, 1, 1] * 4)[1], half_width)
+
+		self.assertEqual(stats.mean_interval([0.5, 0.5, 0.5]), (0.5, 0.0))
+		self.assertEqual(stats.mean_interval([1])[1], math.inf)
@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from api import Deck
+from api._tables import LEAD_WINS, TRICK_POINTS, SUIT_IDS, RANK_IDS
+
+
+class TestTables(TestCase):
+
+	def test_lead_wins(self):
+		# Compare the table with the trick rules written out on the suit and rank strings
+		deck = Deck.generate(0)
+		ranks = ["A", "10", "K", "Q", "J"]
+		for trump_id, trump in enumerate(["C", "D", "H", "S"]):
+			for lead in range(20):
+				for follow in range(20):
+					if lead == follow:
+						continue
+					if deck.get_suit(lead) == deck.get_suit(follow):
+						expected = ranks.index(deck.get_rank(lead)) < ranks.index(deck.get_rank(follow))
+					else:
+						expected = deck.get_suit(follow) != trump
+					self.assertEqual(LEAD_WINS[(trump_id * 20 + lead) * 20 + follow], expected)
+
+	def test_trick_points(self):
+		scores = [11, 10, 4, 3, 2]
+		for lead in range(20):
+			for follow in range(20):
+				self.assertEqual(TRICK_POINTS[lead * 20 + follow], scores[lead % 5] + scores[follow % 5])
+
+	def test_suits_and_ranks(self):
+		deck = Deck.generate(0)
+		for card in range(20):
+			self.assertEqual("CDHS"[SUIT_IDS[card]], deck.get_suit(card))
+			self.assertEqual(["A", "10", "K", "Q", "J"][RANK_IDS[card]], deck.get_rank(card))
@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from api import State, engine, util
+from api.timing import MoveTimes
+
+
+class TestTiming(TestCase):
+
+	def test_percentiles(self):
+		times = MoveTimes()
+		for i in range(1, 101):
+			times.add("a", i / 1000.0, 1 if i <= 60 else 2, 5, 5)
+
+		self.assertEqual(times.percentiles("a"), [0.05, 0.095, 0.099, 0.1])
+		self.assertEqual(times.percentiles("a", (0, 50)), [0.001, 0.05])
+		self.assertEqual(times.percentiles("a", (100,), phase=1), [0.06])
+		self.assertEqual(times.percentiles("a", (0,), phase=2), [0.061])
+		self.assertIsNone(times.percentiles("b"))
+
+		other = MoveTimes()
+		other.add("a", 1.0, 2, 1, 1)
+		other.add("b", 0.5, 1, 5, 3)
+		times.merge(other)
+		self.assertEqual(times.percentiles("a", (100,)), [1.0])
+		self.assertEqual(times.percentiles("b", (50,)), [0.5])
+
+		report = times.report(max_time=5)
+		self.assertEqual(len(report.splitlines()), 1 + 3 + 2)
+		self.assertIn("20%", report)
+
+	def test_recorder(self):
+		times = MoveTimes()
+		bots = [util.load_player("rand"), util.load_player("bully")]
+		engine.play(bots[0], bots[1], State.generate(4), verbose=False, fast=True, on_move=times.recorder("rand", "bully"))
+
+		samples = times.samples["rand"] + times.samples["bully"]
+		self.assertEqual(set(times.samples), {"rand", "bully"})
+		self.assertTrue(all(seconds >= 0 and phase in (1, 2) and 1 <= hand_size <= 5 and 1 <= legal_moves <= hand_size + 2 for seconds, phase, hand_size, legal_moves in samples))
+		# Hands hold five cards until the stock runs out
+		self.assertTrue(all(hand_size == 5 for seconds, phase, hand_size, legal_moves in samples if phase == 1))
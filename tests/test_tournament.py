@@ -0,0 +1,150 @@
+from unittest import TestCase
+
+from argparse import Namespace
+from api.results import ResultStore
+from api.rating import Ratings
+import os, sqlite3, tempfile
+import tournament
+
+
+def options(**changes):
+	values = dict(players="rand,bully,rdeep", repeats=3, phase=1, max_time=5, fast=True, persistent=False, forkserver=False, ponder=False, deadlines=False, verbose=False, workers=1, seed=11, results=None, resume=False, ratings=None, gauntlet=None, latency=False, match=False, duplicate=False, confidence=0.95, sprt=False, elo0=-20.0, elo1=20.0, alpha=0.05, beta=0.05)
+	values.update(changes)
+	return Namespace(**values)
+
+
+class TestTournament(TestCase):
+
+	def test_jobs(self):
+		jobs = tournament.make_jobs(4, 5, 1)
+		self.assertEqual(len(jobs), 6 * 5)
+		self.assertEqual(jobs, tournament.make_jobs(4, 5, 1))
+		self.assertNotEqual(jobs, tournament.make_jobs(4, 5, 2))
+		self.assertEqual(sorted(set(tuple(sorted(p)) for p, seed in jobs)), [(0, 1), (0, 2), (0, 3), (1, 2), (1, 3), (2, 3)])
+
+	def test_gauntlet_jobs(self):
+		self.assertEqual(tournament.make_pairs(4, gauntlet=2), [(2, 0), (2, 1), (2, 3)])
+		jobs = tournament.make_jobs(4, 5, 1, gauntlet=2)
+		self.assertEqual(len(jobs), 3 * 5)
+		self.assertTrue(all(2 in p for p, seed in jobs))
+
+	def test_duplicate_jobs(self):
+		jobs = tournament.make_jobs(3, 4, 1, duplicate=True)
+		self.assertEqual(len(jobs), 3 * 4 * 2)
+		# Every deal is played twice in a row, with the seats swapped
+		for (p, seed), (q, other) in zip(jobs[::2], jobs[1::2]):
+			self.assertEqual(seed, other)
+			self.assertEqual(p, q[::-1])
+		self.assertEqual(len(set(seed for p, seed in jobs)), 12)
+
+	def test_workers_reproduce(self):
+		# The results do not depend on the number of processes the games are spread over
+		self.assertEqual(tournament.run_tournament(options(workers=2)), tournament.run_tournament(options()))
+		self.assertEqual(tournament.run_tournament(options(workers=2, latency=True)), tournament.run_tournament(options()))
+		self.assertEqual(tournament.run_tournament(options(fast=False, workers=2)), tournament.run_tournament(options(fast=False, persistent=True)))
+		self.assertEqual(tournament.run_tournament(options(fast=False, forkserver=True)), tournament.run_tournament(options(fast=False)))
+
+	def test_resume(self):
+		directory = tempfile.mkdtemp()
+		path = os.path.join(directory, "results.db")
+		wins = tournament.run_tournament(options(results=path))
+
+		store = ResultStore(path)
+		games = store.games()
+		store.close()
+		self.assertEqual(len(games), 9)
+		self.assertTrue(all(game["tournament_seed"] == 11 and game["moves"] > 0 for game in games))
+
+		# Forget some games, as if the tournament was interrupted, and resume it without giving the seed
+		connection = sqlite3.connect(path)
+		connection.execute("DELETE FROM games WHERE id > 4")
+		connection.commit()
+		connection.close()
+
+		self.assertEqual(tournament.run_tournament(options(results=path, resume=True, seed=None, workers=2)), wins)
+
+		store = ResultStore(path)
+		resumed = store.games()
+		store.close()
+		self.assertEqual(resumed[:4], games[:4])
+		self.assertEqual(sorted((game["player1"], game["seed"], game["winner"]) for game in resumed), sorted((game["player1"], game["seed"], game["winner"]) for game in games))
+
+	def test_sprt(self):
+		# rdeep is clearly stronger than rand and bully, so those pairs are decided long before the maximum
+		directory = tempfile.mkdtemp()
+		path = os.path.join(directory, "results.db")
+		wins = tournament.run_tournament(options(repeats=100, sprt=True, results=path))
+		self.assertLess(sum(wins), 300)
+
+		store = ResultStore(path)
+		played = store.games()
+		store.close()
+		self.assertGreaterEqual(len(played), sum(wins))
+		for opponent in ("rand", "bully"):
+			games = [game for game in played if opponent in (game["player1"], game["player2"]) and "rdeep" in (game["player1"], game["player2"])]
+			self.assertLess(len(games), 100)
+			self.assertGreater(sum(1 for game in games if (game["player1"] if game["winner"] == 1 else game["player2"]) == "rdeep"), len(games) // 2)
+
+		# The decisions do not depend on the order the games finish in
+		self.assertEqual(tournament.run_tournament(options(repeats=100, sprt=True, workers=3)), wins)
+
+	def test_duplicate(self):
+		directory = tempfile.mkdtemp()
+		path = os.path.join(directory, "results.db")
+		wins = tournament.run_tournament(options(duplicate=True, results=path))
+		self.assertEqual(sum(wins), 18)
+
+		store = ResultStore(path)
+		games = store.games()
+		store.close()
+		self.assertEqual(len(games), 18)
+		deals = {}
+		for game in games:
+			deals.setdefault(game["seed"], set()).add((game["player1"], game["player2"]))
+		self.assertTrue(all(len(seats) == 2 and set(a for a, b in seats) == set(b for a, b in seats) for seats in deals.values()))
+
+		self.assertEqual(tournament.run_tournament(options(duplicate=True, workers=2)), wins)
+
+	def test_match(self):
+		directory = tempfile.mkdtemp()
+		path = os.path.join(directory, "results.db")
+		tournament.run_tournament(options(results=path, repeats=2))
+		wins = tournament.run_tournament(options(match=True, results=path, repeats=2))
+		self.assertEqual(sum(wins), 6)
+
+		# Matches and single rounds with the same seeds are recorded separately
+		store = ResultStore(path)
+		games = store.games()
+		store.close()
+		self.assertEqual(len(games), 12)
+		matches = [game for game in games if game["match_points"] == tournament.MATCH_POINTS]
+		self.assertEqual(len(matches), 6)
+		self.assertTrue(all(game["rounds"] >= 3 and game["points"] >= tournament.MATCH_POINTS for game in matches))
+		self.assertTrue(all(game["rounds"] == 1 for game in games if game["match_points"] == 0))
+
+		self.assertEqual(tournament.run_tournament(options(match=True, repeats=2, workers=2)), wins)
+		self.assertEqual(tournament.run_tournament(options(match=True, results=path, resume=True, repeats=2)), wins)
+
+	def test_ratings(self):
+		directory = tempfile.mkdtemp()
+		path = os.path.join(directory, "results.db")
+		tournament.run_tournament(options(players="rand,bully", repeats=6, results=path, ratings=path))
+
+		ratings = Ratings(path)
+		self.assertEqual(ratings.games("rand"), 6)
+		anchors = ratings.rating("rand"), ratings.rating("bully")
+		ratings.close()
+
+		# A gauntlet places a new bot against the rated ones, without changing their ratings
+		tournament.run_tournament(options(repeats=4, results=path, ratings=path, gauntlet="rdeep", seed=12))
+		ratings = Ratings(path)
+		self.assertEqual((ratings.rating("rand"), ratings.rating("bully")), anchors)
+		self.assertEqual(ratings.games("rdeep"), 8)
+		self.assertGreater(ratings.rating("rdeep"), max(anchors))
+		ratings.close()
+
+		# Resuming the gauntlet does not rate the recorded games again
+		tournament.run_tournament(options(repeats=4, results=path, ratings=path, gauntlet="rdeep", seed=12, resume=True))
+		ratings = Ratings(path)
+		self.assertEqual(ratings.games("rdeep"), 8)
+		ratings.close()
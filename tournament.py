@@ -7,61 +7,340 @@ python play.py -h
 """
 
 from argparse import ArgumentParser
-from api import State, util, engine
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from api import State, util, engine, stats
+from api.results import ResultStore
+from api.rating import Ratings
+from api.timing import MoveTimes
 import random, time
 
-def run_tournament(options):
-
-    botnames = options.players.split(",")
-
-
-    bots = []
-    for botname in botnames:
-        bots.append(util.load_player(botname))
-
-
-    n = len(bots)
-    wins = [0] * len(bots)
-    matches = [(p1, p2) for p1 in range(n) for p2 in range(n) if p1 < p2]
-
-    totalgames = (n*n - n)/2 * options.repeats
-    playedgames = 0
-
-
-    print('Playing {} games:'.format(int(totalgames)))
-    for a, b in matches:
-        for r in range(options.repeats):
-
-
-            if random.choice([True, False]):
-                p = [a, b]
+# The number of game points needed to win a full match (--match)
+MATCH_POINTS = 7
+
+# The options and bots of the current process (a pool worker, or the main process), set up by init_process
+settings = None
+bots = None
+workers = None
+server = None
+
+def init_process(options):
+    """
+    Loads the bots of the tournament in the current process.
+    """
+    global settings, bots, workers, server
+
+    settings = options
+    bots = [util.load_player(botname) for botname in options.players.split(",")]
+
+    # Each bot gets one long-running process for the whole tournament
+    workers = None
+    if options.persistent and not options.fast:
+        workers = [engine.BotWorker(bot) for bot in bots]
+
+    # Or a new process for every move, forked from a process that has all bots loaded
+    server = None
+    if options.forkserver and not options.fast:
+        server = engine.ForkServer(options.players.split(","))
+        workers = [server.seat(index) for index in range(len(bots))]
+
+def close_process():
+    """
+    Stops the worker processes of the bots in the current process.
+    """
+    if server is not None:
+        server.close()
+    elif workers is not None:
+        for worker in workers:
+            worker.close()
+
+def play_game(job):
+    """
+    Plays one game of the tournament, or with --match one full match.
+
+    :param job: A pair (p, seed) of the indices of the bots playing as player 1 and player 2, and the seed of the game
+    :return: The player id of the winner (or None), the number of game points it won, the number of
+        moves made, the total time each player took for its moves, the number of rounds played and,
+        with --latency, a MoveTimes collector with the time of every move (None otherwise)
+    """
+    p, seed = job
+
+    moves = [0]
+    think_time = [0.0, 0.0]
+
+    times = None
+    if settings.latency:
+        botnames = settings.players.split(",")
+        times = MoveTimes()
+        record = times.recorder(botnames[p[0]], botnames[p[1]])
+
+    def on_move(player, state, move, seconds):
+        moves[0] += 1
+        think_time[player - 1] += seconds
+        if times is not None:
+            record(player, state, move, seconds)
+
+    # The global generator (used by the bots) is seeded as well, so the outcome of a game
+    # does not depend on which games were played before it in the same process
+    random.seed(seed)
+
+    game_workers = None if workers is None else (workers[p[0]], workers[p[1]])
+
+    if settings.match:
+        winner, match_points, rounds = engine.play_match(bots[p[0]], bots[p[1]], seed, MATCH_POINTS, int(settings.phase), settings.max_time*1000, verbose=settings.verbose, fast=settings.fast, workers=game_workers, on_move=on_move, ponder=settings.ponder, deadlines=settings.deadlines)
+        return winner, match_points[winner - 1], moves[0], think_time, rounds, times
+
+    state = State.generate(seed, phase=int(settings.phase))
+
+    winner, score = engine.play(bots[p[0]], bots[p[1]], state, settings.max_time*1000, verbose=settings.verbose, fast=settings.fast, workers=game_workers, on_move=on_move, ponder=settings.ponder, deadlines=settings.deadlines)
+
+    return winner, score, moves[0], think_time, 1, times
+
+class InlineExecutor:
+    """
+    Plays every submitted game right away in the current process, for tournaments without --workers.
+    Has the parts of the interface of ProcessPoolExecutor that the tournament uses.
+    """
+    def __init__(self, options):
+        init_process(options)
+
+    def submit(self, function, *args):
+        future = Future()
+        try:
+            future.set_result(function(*args))
+        except BaseException as exception:
+            future.set_exception(exception)
+        return future
+
+    def shutdown(self, cancel_futures=False):
+        close_process()
+
+def make_pairs(n, gauntlet=None):
+    """
+    :param gauntlet: The index of a bot that plays all others, who do not play each other. If None,
+        every bot plays every other bot.
+    :return: A list of (a, b) pairs of the indices of the bots that play each other
+    """
+    if gauntlet is not None:
+        return [(gauntlet, other) for other in range(n) if other != gauntlet]
+
+    return [(p1, p2) for p1 in range(n) for p2 in range(n) if p1 < p2]
+
+def make_jobs(n, repeats, seed, duplicate=False, gauntlet=None):
+    """
+    Lists the games of a round-robin tournament between n bots in a fixed order, each with the
+    seat order and a seed drawn from a generator with the given seed.
+
+    :param duplicate: Whether every deal is played twice in a row, the second time with the seats swapped
+    :param gauntlet: The index of the bot to play a gauntlet with instead, see make_pairs
+    :return: A list of (p, seed) pairs, see play_game
+    """
+    rng = random.Random(seed)
+    pairs = make_pairs(n, gauntlet)
+
+    jobs = []
+    for a, b in pairs:
+        for r in range(repeats):
+
+            if duplicate:
+                game_seed = rng.getrandbits(32)
+                jobs.append(((a, b), game_seed))
+                jobs.append(((b, a), game_seed))
+                continue
+
+            if rng.choice([True, False]):
+                p = (a, b)
             else:
-                p = [b, a]
+                p = (b, a)
 
-            # Generate a state with a random seed
-            state = State.generate(phase=int(options.phase))
+            jobs.append((p, rng.getrandbits(32)))
 
-            winner, score = engine.play(bots[p[0]], bots[p[1]], state, options.max_time*1000, verbose=options.verbose, fast=options.fast)
+    return jobs
 
-            if winner is not None:
-                winner = p[winner - 1]
-                wins[winner] += 1
-
-
-            playedgames += 1
-            # if playedgames % 1000 == 0:
-                # print(wins[0])
-
-            print('Played {} out of {:.0f} games ({:.0f}%): {} \r'.format(playedgames, totalgames, playedgames/float(totalgames) * 100, wins))
-            # wins = [0, 0]
-
-    # print('Results:')
-    # for i in range(len(bots)):
-    #
-    #     print('    bot {}: {} points'.format(bots[i], wins[i]))
+def run_tournament(options):
 
+    botnames = options.players.split(",")
 
+    n = len(botnames)
+    wins = [0] * len(botnames)
+
+    # Every finished game is recorded right away, so an interrupted tournament can be resumed
+    store = ResultStore(options.results) if options.results is not None else None
+
+    # Every newly played game updates the ratings right away. Games that were recorded before were rated
+    # when they were played, so resuming a tournament does not count them twice.
+    ratings = Ratings(options.ratings) if options.ratings is not None else None
+
+    # In a gauntlet, only the rating of the bot running it changes, the others are the fixed anchors
+    gauntlet = None
+    if options.gauntlet is not None:
+        gauntlet = botnames.index(options.gauntlet)
+    anchors = [name for name in botnames if name != options.gauntlet] if gauntlet is not None else []
+
+    # Without a given seed, continue the last tournament when resuming, or draw a new seed and show
+    # it, so the tournament can be reproduced
+    seed = options.seed
+    if seed is None and options.resume:
+        seed = store.last_tournament_seed()
+    if seed is None:
+        seed = random.getrandbits(32)
+    print('Tournament seed: {}'.format(seed))
+
+    jobs = make_jobs(n, options.repeats, seed, duplicate=options.duplicate, gauntlet=gauntlet)
+    phase = int(options.phase)
+    match_points = MATCH_POINTS if options.match else 0
+
+    # The games of each pair of bots are consecutive jobs. They are scored in units: a single game,
+    # or with --duplicate both games of a deal together.
+    width = 2 if options.duplicate else 1
+    per_pair = options.repeats * width
+
+    pairs = make_pairs(n, gauntlet)
+    pair_jobs = [range(k * per_pair, (k + 1) * per_pair) for k in range(len(pairs))]
+
+    # The winning player id, the game points and the number of rounds of every finished game, None for the others
+    results = [None] * len(jobs)
+
+    # With --resume, the games that were recorded before count, but are not played again
+    for index, (p, game_seed) in enumerate(jobs):
+        recorded = store.get(botnames[p[0]], botnames[p[1]], game_seed, phase, match_points) if options.resume else None
+        if recorded is not None:
+            results[index] = recorded
+
+    # The games of a pair are counted in order, and with --sprt only until the test is decided. Since
+    # games can finish in any order, this makes the outcome independent of the scheduling.
+    counted = [0] * len(pairs)
+    pair_wins = [[0, 0] for pair in pairs]
+    pair_scores = [[] for pair in pairs]
+    pair_rounds = [[] for pair in pairs]
+    decisions = [0] * len(pairs)
+
+    def count(k):
+        a, b = pairs[k]
+        while decisions[k] == 0 and counted[k] < per_pair:
+            unit = pair_jobs[k][counted[k]:counted[k] + width]
+            if any(results[index] is None for index in unit):
+                break
+
+            # The score of the first bot of the pair in every game of the unit
+            scores = []
+            for index in unit:
+                p, game_seed = jobs[index]
+                winner = results[index][0]
+                pair_rounds[k].append(results[index][2])
+
+                if winner is None:
+                    scores.append(0.5)
+                else:
+                    wins[p[winner - 1]] += 1
+                    pair_wins[k][0 if p[winner - 1] == a else 1] += 1
+                    scores.append(1.0 if p[winner - 1] == a else 0.0)
+
+            # Both games of a duplicate deal make one sample. The luck of the deal is shared by both, so it
+            # largely cancels out, and the samples vary much less than the results of single games.
+            pair_scores[k].append(sum(scores) / len(scores))
+            counted[k] += width
+
+            if options.sprt:
+                decisions[k] = stats.sprt(pair_wins[k][0], pair_wins[k][1], options.elo0, options.elo1, options.alpha, options.beta)
+
+    for k in range(len(pairs)):
+        count(k)
+
+    totalgames = len(jobs)
+    playedgames = sum(1 for result in results if result is not None)
 
+    print('Playing {} games:'.format(int(totalgames)))
+    if playedgames > 0:
+        print('{} games were already recorded: {}'.format(playedgames, wins))
+
+    # The next game to start for each pair
+    started = list(counted)
+
+    def next_job():
+        # Spread the games over the undecided pairs, so a decided pair frees its share of the workers
+        for k in sorted(range(len(pairs)), key=lambda k: started[k] - counted[k]):
+            while decisions[k] == 0 and started[k] < per_pair:
+                index = pair_jobs[k][started[k]]
+                started[k] += 1
+                if results[index] is None:
+                    return index
+        return None
+
+    # The move times of all games played, with --latency
+    latency = MoveTimes()
+
+    executor = ProcessPoolExecutor(options.workers, initializer=init_process, initargs=(options,)) if options.workers > 1 else InlineExecutor(options)
+    running = {}
+
+    try:
+        while True:
+            while len(running) < options.workers:
+                index = next_job()
+                if index is None:
+                    break
+                running[executor.submit(play_game, jobs[index])] = index
+
+            if len(running) == 0:
+                break
+
+            done, not_done = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                p, game_seed = jobs[index]
+                winner, score, moves, think_time, rounds, times = future.result()
+
+                if times is not None:
+                    latency.merge(times)
+
+                if store is not None:
+                    store.add(botnames[p[0]], botnames[p[1]], game_seed, phase, winner, score, moves, think_time[0], think_time[1], tournament_seed=seed, match_points=match_points, rounds=rounds)
+
+                if ratings is not None:
+                    ratings.update(botnames[p[0]], botnames[p[1]], {1: 1.0, 2: 0.0, None: 0.5}[winner], fixed=anchors)
+
+                results[index] = (winner, score, rounds)
+                count(index // per_pair)
+
+                playedgames += 1
+
+                print('Played {} out of {:.0f} games ({:.0f}%): {} \r'.format(playedgames, totalgames, playedgames/float(totalgames) * 100, wins))
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if store is not None:
+            store.close()
+        if ratings is not None:
+            ratings.close()
+
+    if options.duplicate:
+        print('Scores of the first bot of each pair over duplicate deals, with {:.0f}% confidence intervals:'.format(options.confidence * 100))
+        for k, (a, b) in enumerate(pairs):
+            mean, half_width = stats.mean_interval(pair_scores[k], options.confidence)
+            elo = [stats.elo_difference(score) for score in (mean - half_width, mean, mean + half_width)]
+            print('    {} vs {}: {:.3f} +- {:.3f} over {} deals, Elo {:+.0f} [{:+.0f}, {:+.0f}]'.format(botnames[a], botnames[b], mean, half_width, len(pair_scores[k]), elo[1], elo[0], elo[2]))
+
+    if options.match:
+        print('Full matches to {} game points, with {:.0f}% confidence intervals on the match win rate of the first bot:'.format(MATCH_POINTS, options.confidence * 100))
+        for k, (a, b) in enumerate(pairs):
+            mean, half_width = stats.mean_interval(pair_scores[k], options.confidence)
+            print('    {} vs {}: {}-{} matches, win rate {:.3f} +- {:.3f}, {:.1f} rounds per match'.format(botnames[a], botnames[b], pair_wins[k][0], pair_wins[k][1], mean, half_width, sum(pair_rounds[k]) / float(max(len(pair_rounds[k]), 1))))
+
+    if options.sprt:
+        print('Sequential tests (H1: first bot {:+g} Elo, H0: {:+g} Elo):'.format(options.elo1, options.elo0))
+        for k, (a, b) in enumerate(pairs):
+            outcome = {1: 'H1 accepted, {} is stronger'.format(botnames[a]), -1: 'H0 accepted, {} is stronger'.format(botnames[b]), 0: 'undecided'}[decisions[k]]
+            llr = stats.sprt_llr(pair_wins[k][0], pair_wins[k][1], options.elo0, options.elo1)
+            print('    {} vs {}: {} after {} games ({}-{}, LLR {:.2f})'.format(botnames[a], botnames[b], outcome, counted[k], pair_wins[k][0], pair_wins[k][1], llr))
+
+    if options.latency:
+        print('Move times:')
+        print(latency.report(options.max_time))
+
+    if ratings is not None:
+        print('Elo ratings:')
+        for name, rating, games in ratings.table():
+            print('    {:>8.1f}  {} ({} games)'.format(rating, name, games))
+
+    return wins
 
 
 if __name__ == "__main__":
@@ -81,7 +360,7 @@ if __name__ == "__main__":
 
     parser.add_argument("-r", "--repeats",
                         dest="repeats",
-                        help="How many matches to play for each pair of bots",
+                        help="How many pairs to play for each pair of bots",
                         type=int, default=10)
 
     parser.add_argument("-t", "--max-time",
@@ -94,6 +373,101 @@ if __name__ == "__main__":
                         action="store_true",
                         help="This option forgoes the engine's check of whether a bot is able to make a decision in the allotted time, so only use this option if you are sure that your bot is stable.")
 
+    parser.add_argument("--persistent",
+                        dest="persistent",
+                        action="store_true",
+                        help="Keep each bot in one process for the whole tournament instead of starting a new process for every move. The time limit is still enforced.")
+
+    parser.add_argument("-w", "--workers",
+                        dest="workers",
+                        help="Number of processes to play games in parallel (default: 1)",
+                        type=int, default=1)
+
+    parser.add_argument("--seed",
+                        dest="seed",
+                        help="Seed from which the seat order and the seed of every game are drawn, to reproduce a tournament",
+                        type=int, default=None)
+
+    parser.add_argument("--forkserver",
+                        dest="forkserver",
+                        action="store_true",
+                        help="Fork the process for every move from a process that has loaded all bots once, instead of from the tournament process. Not available on Windows.")
+
+    parser.add_argument("--ponder",
+                        dest="ponder",
+                        action="store_true",
+                        help="Let bots that have a ponder method think while they wait for the opponent's move. Requires --persistent.")
+
+    parser.add_argument("--deadlines",
+                        dest="deadlines",
+                        action="store_true",
+                        help="Tell bots that accept a deadline how much time they have left for every move, so they can search until it runs out. Their moves then depend on the speed of the machine. Has no effect with --fast.")
+
+    parser.add_argument("--results",
+                        dest="results",
+                        help="SQLite database file in which every finished game is recorded",
+                        default=None)
+
+    parser.add_argument("--resume",
+                        dest="resume",
+                        action="store_true",
+                        help="Skip the games that are already recorded in the --results database. Without --seed, the last recorded tournament is continued.")
+
+    parser.add_argument("--ratings",
+                        dest="ratings",
+                        help="Update the Elo ratings of the bots after every game, kept in this SQLite database file (which can be the same as --results). The ratings carry over to later tournaments.",
+                        default=None)
+
+    parser.add_argument("--gauntlet",
+                        dest="gauntlet",
+                        help="Let this bot (one of --players) play all the others, who do not play each other. With --ratings, only the rating of this bot changes, so the others serve as anchors to place a new bot.",
+                        default=None)
+
+    parser.add_argument("--latency",
+                        dest="latency",
+                        action="store_true",
+                        help="Record how long every move takes, and show the percentiles per bot and phase after the tournament.")
+
+    parser.add_argument("--match",
+                        dest="match",
+                        action="store_true",
+                        help="Play full matches instead of single rounds: rounds are played until one bot has 7 game points, and the starting player alternates. Every game of the tournament is then one match.")
+
+    parser.add_argument("--duplicate",
+                        dest="duplicate",
+                        action="store_true",
+                        help="Play every deal twice, with the seats swapped, and score both games together. The luck of the deal then largely cancels out. --repeats is the number of deals per pair.")
+
+    parser.add_argument("--confidence",
+                        dest="confidence",
+                        help="Confidence level of the intervals reported with --duplicate (default: 0.95)",
+                        type=float, default=0.95)
+
+    parser.add_argument("--sprt",
+                        dest="sprt",
+                        action="store_true",
+                        help="Stop playing a pair of bots once a sequential probability ratio test decides which is stronger. --repeats is then the maximum number of games per pair.")
+
+    parser.add_argument("--elo0",
+                        dest="elo0",
+                        help="Elo difference of the first bot of a pair under H0 of the sequential test (default: -20)",
+                        type=float, default=-20.0)
+
+    parser.add_argument("--elo1",
+                        dest="elo1",
+                        help="Elo difference of the first bot of a pair under H1 of the sequential test (default: 20)",
+                        type=float, default=20.0)
+
+    parser.add_argument("--alpha",
+                        dest="alpha",
+                        help="Probability of accepting H1 when H0 is true in the sequential test (default: 0.05)",
+                        type=float, default=0.05)
+
+    parser.add_argument("--beta",
+                        dest="beta",
+                        help="Probability of accepting H0 when H1 is true in the sequential test (default: 0.05)",
+                        type=float, default=0.05)
+
     parser.add_argument("-v", "--verbose",
                         dest="verbose",
                         action="store_true",
@@ -101,4 +475,16 @@ if __name__ == "__main__":
 
     options = parser.parse_args()
 
+    if options.forkserver and options.persistent:
+        parser.error("--forkserver and --persistent cannot be combined")
+
+    if options.ponder and not options.persistent:
+        parser.error("--ponder requires --persistent")
+
+    if options.resume and options.results is None:
+        parser.error("--resume requires --results")
+
+    if options.gauntlet is not None and options.gauntlet not in options.players.split(","):
+        parser.error("--gauntlet must be one of --players")
+
     run_tournament(options)